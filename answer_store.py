@@ -0,0 +1,91 @@
+from flask import current_app
+from sqlalchemy import select, update, delete
+from models import db, QuizResult, UserAnswer
+from grading import NOT_ANSWERED, option_code
+
+
+def packed_storage_enabled():
+    """ANSWER_STORAGE = 'packed' stores answers on QuizResult instead of UserAnswer rows."""
+    return current_app.config.get('ANSWER_STORAGE', 'rows') == 'packed'
+
+
+def pack(question_ids, codes):
+    """Encode question ids and selected option codes (0 = not answered) as two strings."""
+    return ','.join(str(question_id) for question_id in question_ids), ''.join(str(code) for code in codes)
+
+
+def unpack(question_ids, packed_answers):
+    """{question id: selected option} from the packed columns."""
+    ids = [int(question_id) for question_id in question_ids.split(',')] if question_ids else []
+    return {
+        question_id: option if option != '0' else NOT_ANSWERED
+        for question_id, option in zip(ids, packed_answers or '')
+    }
+
+
+def load_answers(attempt):
+    """{question id: selected option} for an attempt, whichever format it was stored in."""
+    if attempt.packed_answers is not None:
+        return unpack(attempt.question_ids, attempt.packed_answers)
+    rows = (
+        db.session.query(UserAnswer.question_id, UserAnswer.selected_option)
+        .filter(UserAnswer.user_id == attempt.user_id, UserAnswer.quiz_id == attempt.quiz_id)
+        .all()
+    )
+    return dict(rows)
+
+
+def pack_existing_answers(batch_size=1000, delete_rows=False, progress=None):
+    """Convert attempts stored as UserAnswer rows to the packed format.
+
+    Walks QuizResult by id in batches; each batch reads the answers of its
+    attempts with one query, writes the packed columns and commits. With
+    ``delete_rows`` the converted UserAnswer rows are removed in the same
+    transaction. Safe to re-run: packed attempts are skipped.
+    """
+    converted = 0
+    last_id = 0
+    while True:
+        attempts = db.session.execute(
+            select(QuizResult.id, QuizResult.user_id, QuizResult.quiz_id, QuizResult.question_ids)
+            .where(QuizResult.id > last_id, QuizResult.packed_answers.is_(None))
+            .order_by(QuizResult.id)
+            .limit(batch_size)
+        ).all()
+        if not attempts:
+            return converted
+        last_id = attempts[-1].id
+
+        user_ids = {attempt.user_id for attempt in attempts}
+        quiz_ids = {attempt.quiz_id for attempt in attempts}
+        answers = {}
+        for row in db.session.execute(
+            select(UserAnswer.user_id, UserAnswer.quiz_id, UserAnswer.question_id, UserAnswer.selected_option)
+            .where(UserAnswer.user_id.in_(user_ids), UserAnswer.quiz_id.in_(quiz_ids))
+            .order_by(UserAnswer.question_id)
+        ):
+            answers.setdefault((row.user_id, row.quiz_id), {})[row.question_id] = row.selected_option
+
+        for attempt in attempts:
+            selected = answers.get((attempt.user_id, attempt.quiz_id), {})
+            # keep the order the questions were asked in when it is known
+            if attempt.question_ids:
+                order = [int(question_id) for question_id in attempt.question_ids.split(',')]
+            else:
+                order = list(selected)
+            question_ids, packed_answers = pack(
+                order, [option_code(selected.get(question_id)) for question_id in order],
+            )
+            db.session.execute(
+                update(QuizResult)
+                .where(QuizResult.id == attempt.id)
+                .values(question_ids=question_ids, packed_answers=packed_answers)
+            )
+            if delete_rows:
+                db.session.execute(
+                    delete(UserAnswer).where(UserAnswer.user_id == attempt.user_id, UserAnswer.quiz_id == attempt.quiz_id)
+                )
+        db.session.commit()
+        converted += len(attempts)
+        if progress:
+            progress(converted)
@@ -1,30 +1,138 @@
 from flask import Flask
 from dotenv import load_dotenv
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
 from models import db
+from instrumentation import init_instrumentation
+from pooling import engine_options, init_pool_audit
 
-#app initialize
-app = Flask(__name__)
 
-#load environment variable
-load_dotenv()
+def create_app(config=None):
+    """Build the app from the environment, with ``config`` applied on top.
 
-#app configure
-# supabase configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('SQLALCHEMY_DATABASE_URI')
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = os.getenv('SQLALCHEMY_TRACK_MODIFICATIONS')
+    Blueprints are imported here rather than at module level, and heavy
+    libraries such as matplotlib are imported on first use, so importing
+    this module is cheap. With PRELOAD_HEAVY_IMPORTS they are loaded up
+    front instead, for a gunicorn master started with --preload whose
+    forked workers then share the pages.
+    """
+    #app initialize
+    app = Flask(__name__)
 
-# initialize db with app
-db.init_app(app)
+    #load environment variable
+    load_dotenv()
 
-from routes import main
-app.register_blueprint(main)
+    #app configure
+    # supabase configuration
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('SQLALCHEMY_DATABASE_URI')
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = os.getenv('SQLALCHEMY_TRACK_MODIFICATIONS')
+
+    # role claim: trust the signed role stored in the session instead of loading the user on every request
+    app.config['ROLE_CLAIM_TRUST'] = os.getenv('ROLE_CLAIM_TRUST', 'false').lower() == 'true'
+    app.config['ROLE_CLAIM_MAX_AGE'] = int(os.getenv('ROLE_CLAIM_MAX_AGE', 300))
+    app.config['ROLE_CLAIM_VERSION'] = os.getenv('ROLE_CLAIM_VERSION', '1')
+    # revocations are stored in the database; each worker reloads them after this many seconds (0 = every request)
+    app.config['ROLE_CLAIM_REVOCATION_REFRESH'] = float(os.getenv('ROLE_CLAIM_REVOCATION_REFRESH', 1))
+
+    # purge: rows deleted per transaction, and whether purges run in a background thread
+    app.config['PURGE_CHUNK_SIZE'] = int(os.getenv('PURGE_CHUNK_SIZE', 5000))
+    app.config['PURGE_IN_BACKGROUND'] = os.getenv('PURGE_IN_BACKGROUND', 'false').lower() == 'true'
+
+    # search: 'auto' picks FTS5 (SQLite) or pg_trgm (Postgres) when available, 'like' forces plain LIKE
+    app.config['SEARCH_BACKEND'] = os.getenv('SEARCH_BACKEND', 'auto')
+    app.config['SEARCH_RESULT_LIMIT'] = int(os.getenv('SEARCH_RESULT_LIMIT', 50))
+
+    # quiz cache: start page payloads kept in memory, refreshed after TTL seconds or on edit,
+    # and quizzes due within PREWARM_WINDOW seconds loaded every PREWARM_INTERVAL seconds by a thread of each
+    # worker (0 = no prewarming)
+    app.config['QUIZ_CACHE_SIZE'] = int(os.getenv('QUIZ_CACHE_SIZE', 256))
+    app.config['QUIZ_CACHE_TTL'] = int(os.getenv('QUIZ_CACHE_TTL', 300))
+    app.config['QUIZ_CACHE_PREWARM_WINDOW'] = int(os.getenv('QUIZ_CACHE_PREWARM_WINDOW', 3600))
+    app.config['QUIZ_CACHE_PREWARM_INTERVAL'] = int(os.getenv('QUIZ_CACHE_PREWARM_INTERVAL', 60))
+
+    # submissions: seconds after the quiz duration a submission token is still accepted
+    app.config['SUBMISSION_TOKEN_GRACE'] = int(os.getenv('SUBMISSION_TOKEN_GRACE', 300))
+    # answers: 'rows' (one UserAnswer per question) or 'packed' (two columns on QuizResult)
+    app.config['ANSWER_STORAGE'] = os.getenv('ANSWER_STORAGE', 'rows')
+
+    # leaderboards: seconds before a worker rebuilds one from the table, rows shown, boards kept per worker
+    app.config['LEADERBOARD_TTL'] = int(os.getenv('LEADERBOARD_TTL', 300))
+    app.config['LEADERBOARD_TOP'] = int(os.getenv('LEADERBOARD_TOP', 10))
+    app.config['LEADERBOARD_CACHE_SIZE'] = int(os.getenv('LEADERBOARD_CACHE_SIZE', 256))
+
+    # item analysis: attempts analysed per chunk; memory grows with it times the questions the chunk touches
+    app.config['ITEM_ANALYSIS_CHUNK_SIZE'] = int(os.getenv('ITEM_ANALYSIS_CHUNK_SIZE', 5000))
+
+    # regrading: attempts recomputed per transaction after a question's answer or marks change, and seconds
+    # before the attempts submitted around the edit are recomputed again (at least the longest request)
+    app.config['REGRADE_CHUNK_SIZE'] = int(os.getenv('REGRADE_CHUNK_SIZE', 1000))
+    app.config['REGRADE_RECHECK_DELAY'] = int(os.getenv('REGRADE_RECHECK_DELAY', 30))
+
+    # instrumentation: per-endpoint SQL and timing totals served at /metrics (to loopback clients unless
+    # METRICS_ALLOW_REMOTE), requests slower than SLOW_REQUEST_MS logged, and a request that runs one
+    # statement N_PLUS_ONE_THRESHOLD times flagged
+    app.config['INSTRUMENTATION_ENABLED'] = os.getenv('INSTRUMENTATION_ENABLED', 'true').lower() == 'true'
+    app.config['SLOW_REQUEST_MS'] = int(os.getenv('SLOW_REQUEST_MS', 500))
+    app.config['N_PLUS_ONE_THRESHOLD'] = int(os.getenv('N_PLUS_ONE_THRESHOLD', 5))
+    app.config['METRICS_ALLOW_REMOTE'] = os.getenv('METRICS_ALLOW_REMOTE', 'false').lower() == 'true'
+
+    # database pool per process: connections kept open, extra ones allowed in bursts, seconds to wait for a
+    # free one, seconds before a connection is replaced, and a liveness check on checkout (see gunicorn.conf.py)
+    app.config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', 5))
+    app.config['DB_MAX_OVERFLOW'] = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    app.config['DB_POOL_TIMEOUT'] = int(os.getenv('DB_POOL_TIMEOUT', 30))
+    app.config['DB_POOL_RECYCLE'] = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    app.config['DB_POOL_PRE_PING'] = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+
+    # passwords: werkzeug hash method with its cost parameters (older hashes are replaced at login), processes
+    # hashing them (0 hashes in the request thread), hashes queued per worker before more are turned away,
+    # and seconds to wait for one
+    app.config['PASSWORD_HASH_METHOD'] = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 16))
+    app.config['PASSWORD_HASH_TIMEOUT'] = int(os.getenv('PASSWORD_HASH_TIMEOUT', 10))
+    # login admission: attempts per username and per client address within the window (0 turns a limit off).
+    # Buckets are kept per worker process, so the real limit is the setting times the number of workers.
+    app.config['LOGIN_ATTEMPT_WINDOW'] = int(os.getenv('LOGIN_ATTEMPT_WINDOW', 60))
+    app.config['LOGIN_ATTEMPTS_PER_USER'] = int(os.getenv('LOGIN_ATTEMPTS_PER_USER', 10))
+    app.config['LOGIN_ATTEMPTS_PER_IP'] = int(os.getenv('LOGIN_ATTEMPTS_PER_IP', 300))
+    # reverse proxies in front of the app that append to X-Forwarded-For; the client address is taken from
+    # that header instead of the connection (0 = none, the app is reached directly)
+    app.config['PROXY_FIX_X_FOR'] = int(os.getenv('PROXY_FIX_X_FOR', 0))
+
+    # startup: import heavy libraries now instead of on first use
+    app.config['PRELOAD_HEAVY_IMPORTS'] = os.getenv('PRELOAD_HEAVY_IMPORTS', 'false').lower() == 'true'
+
+    app.config.update(config or {})
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+
+    # initialize db with app
+    db.init_app(app)
+    init_instrumentation(app)
+    init_pool_audit(app)
+
+    if app.config['PROXY_FIX_X_FOR']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
+
+    from routes import main
+    app.register_blueprint(main)
+
+    from crud_routes import crud
+    app.register_blueprint(crud)
+
+    from commands import commands
+    app.register_blueprint(commands)
+
+    if app.config['PRELOAD_HEAVY_IMPORTS']:
+        from charts import load_renderer
+        load_renderer()
+
+    return app
 
-from crud_routes import crud
-app.register_blueprint(crud)
 
 if __name__ == '__main__':
+    app = create_app()
     with app.app_context():
         db.create_all()
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
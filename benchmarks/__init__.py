@@ -0,0 +1 @@
+"""Benchmarks for the quiz app, run with ``python -m benchmarks.<name>``."""
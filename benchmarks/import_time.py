@@ -0,0 +1,75 @@
+"""Cold start budget: importing the app module and calling create_app().
+
+Each run is a fresh interpreter, so nothing is cached in ``sys.modules``.
+The median over the runs is compared with benchmarks/baselines/import_time.json;
+the check fails when it is more than ``--tolerance`` times the baseline, or
+when a library that should load on first use (matplotlib) was imported.
+
+    python -m benchmarks.import_time --runs 7
+    python -m benchmarks.import_time --update-baseline
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baselines', 'import_time.json')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# top-level packages create_app() must not import
+DEFERRED = ('matplotlib',)
+
+PROBE = f'''
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+create_app({{'SQLALCHEMY_DATABASE_URI': 'sqlite://'}})
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'loaded': [name for name in {DEFERRED!r} if name in sys.modules]}}))
+'''
+
+
+def _probe():
+    env = dict(os.environ, SECRET_KEY=os.environ.get('SECRET_KEY', 'benchmark'), PRELOAD_HEAVY_IMPORTS='false')
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--tolerance', type=float, default=1.5, help='Allowed slowdown factor.')
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args()
+
+    # the first run may compile bytecode, so it is not counted
+    _probe()
+    probes = [_probe() for _ in range(args.runs)]
+    median_ms = statistics.median(probe['seconds'] for probe in probes) * 1000
+    loaded = sorted({name for probe in probes for name in probe['loaded']})
+    print(f'create_app cold start: median {median_ms:.1f} ms over {args.runs} runs')
+
+    if loaded:
+        raise SystemExit(f'imported at startup, expected on first use: {", ".join(loaded)}')
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump({'create_app_ms': round(median_ms, 1)}, f, indent=2)
+            f.write('\n')
+        print(f'baseline written to {args.baseline}')
+        return
+
+    if not os.path.exists(args.baseline):
+        raise SystemExit(f'no baseline at {args.baseline}; run with --update-baseline first')
+    with open(args.baseline) as f:
+        budget = json.load(f)['create_app_ms'] * args.tolerance
+    if median_ms > budget:
+        raise SystemExit(f'cold start {median_ms:.1f} ms is over the budget of {budget:.1f} ms')
+    print(f'within the budget of {budget:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Leaderboard rank lookups and inserts at cohort scale.
+
+Builds a leaderboard from synthetic result arrays with the NumPy path, then
+times ``standing`` for random learners and ``add`` for new results. Fails if
+the median rank lookup is not below one millisecond.
+
+    python -m benchmarks.leaderboard_rank --attempts 100000 --lookups 10000
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--attempts', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=10000)
+    parser.add_argument('--inserts', type=int, default=1000)
+    args = parser.parse_args()
+
+    from leaderboard import Leaderboard
+
+    rng = np.random.default_rng(0)
+    total_marks = np.full(args.attempts, 50)
+    scores = rng.integers(0, 51, args.attempts)
+    ids = np.arange(1, args.attempts + 1)
+
+    start = time.perf_counter()
+    board = Leaderboard.from_arrays(ids, ids, scores, total_marks)
+    print(f'build {args.attempts} results: {(time.perf_counter() - start) * 1000:.1f} ms')
+
+    samples = []
+    for user_id in rng.integers(1, args.attempts + 1, args.lookups).tolist():
+        start = time.perf_counter()
+        board.standing(user_id)
+        samples.append(time.perf_counter() - start)
+    median = statistics.median(samples)
+    print(f'standing: median {median * 1e6:.1f} us, max {max(samples) * 1e6:.1f} us')
+
+    samples = []
+    for offset in range(args.inserts):
+        attempt_id = args.attempts + 1 + offset
+        start = time.perf_counter()
+        board.add(attempt_id, attempt_id, float(rng.integers(0, 101)))
+        samples.append(time.perf_counter() - start)
+    print(f'add: median {statistics.median(samples) * 1e6:.1f} us, max {max(samples) * 1e6:.1f} us')
+
+    if median >= 0.001:
+        raise SystemExit('rank lookup slower than 1 ms')
+
+
+if __name__ == '__main__':
+    main()
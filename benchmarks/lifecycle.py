@@ -0,0 +1,195 @@
+"""Load test of the quiz lifecycle against stored baselines.
+
+Seeds a database (see benchmarks/seed.py), logs learners and the admin in
+through the real login form and drives the app with ``app.test_client()``
+from a thread pool:
+
+    exam_start      GET  /quiz/start/<id>      learners opening a due quiz
+    submit_storm    POST /submit/quiz/<id>     the same learners submitting
+    admin_summary   GET  /admin/summary
+    admin_search    POST /search/result
+    user_summary    GET  /user/summary         learners with attempts
+
+For every scenario it prints p50/p95/p99 latency, throughput and SQL
+statements per request, then compares them with
+benchmarks/baselines/lifecycle.json. More statements per request than the
+baseline (on average), a p95 above ``--tolerance`` times the baseline or any failed
+request make the run exit non-zero.
+
+    python -m benchmarks.lifecycle --users 200 --threads 8
+    python -m benchmarks.lifecycle --update-baseline
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.seed import PASSWORD, add_scale_arguments, configure_database, scale_of, seed_from_args
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baselines', 'lifecycle.json')
+# statements per request a scenario may gain before it counts as a regression
+SQL_SLACK = 1.0
+
+_counter = threading.local()
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if getattr(_counter, 'active', False):
+        _counter.count += 1
+
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+def _login(app, username):
+    client = app.test_client()
+    response = client.post('/login', data={'username': username, 'password': PASSWORD})
+    assert response.status_code == 302, f'login of {username} failed'
+    return client.get_cookie('session').value
+
+
+def _request(app, cookie, method, url, data=None):
+    """Run one request on a fresh client; returns (seconds, statements, status)."""
+    client = app.test_client()
+    client.set_cookie('session', cookie)
+    _counter.count = 0
+    _counter.active = True
+    start = time.perf_counter()
+    try:
+        status = client.open(url, method=method, data=data).status_code
+    finally:
+        elapsed = time.perf_counter() - start
+        _counter.active = False
+    return elapsed, _counter.count, status
+
+
+def _run(app, operations, threads):
+    """Run ``operations`` (cookie, method, url, data) concurrently and summarise them."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        samples = list(pool.map(lambda operation: _request(app, *operation), operations))
+    wall = time.perf_counter() - start
+    latencies = [sample[0] for sample in samples]
+    statements = [sample[1] for sample in samples]
+    return {
+        'requests': len(samples),
+        'p50_ms': _percentile(latencies, 0.50) * 1000,
+        'p95_ms': _percentile(latencies, 0.95) * 1000,
+        'p99_ms': _percentile(latencies, 0.99) * 1000,
+        'throughput': len(samples) / wall if wall else 0.0,
+        'sql_per_request': statistics.mean(statements),
+        'sql_max': max(statements),
+        'failures': sum(1 for sample in samples if sample[2] >= 400),
+    }
+
+
+def _scenarios(app, seeded, args):
+    """Yield (name, operations) in lifecycle order."""
+    attempted = seeded['attempted']
+    quiz_id = seeded['quiz_ids'][0]
+    fresh = [user_id for user_id in seeded['learner_ids'] if quiz_id not in attempted.get(user_id, ())]
+    fresh = fresh[:args.requests]
+    cookies = {user_id: _login(app, f'learner{user_id - 2}') for user_id in fresh}
+    admin = _login(app, 'admin')
+
+    yield 'exam_start', [(cookies[user_id], 'GET', f'/quiz/start/{quiz_id}', None) for user_id in fresh]
+
+    # forms come from an unmeasured render of each learner's start page
+    submits = []
+    for user_id in fresh:
+        client = app.test_client()
+        client.set_cookie('session', cookies[user_id])
+        page = client.get(f'/quiz/start/{quiz_id}').get_data(as_text=True)
+        form = {f'question_{qid}': '1' for qid in re.findall(r'name="question_(\d+)"', page)}
+        form['submission_token'] = re.search(r'name="submission_token" value="([^"]+)"', page).group(1)
+        submits.append((cookies[user_id], 'POST', f'/submit/quiz/{quiz_id}', form))
+    yield 'submit_storm', submits
+
+    yield 'admin_summary', [(admin, 'GET', '/admin/summary', None)] * args.requests
+    yield 'admin_search', [(admin, 'POST', '/search/result', {'search': f'learner{i % 10}'})
+                           for i in range(args.requests)]
+
+    # learners who submitted above now have at least one attempt
+    yield 'user_summary', [(cookies[user_id], 'GET', '/user/summary', None) for user_id in fresh]
+
+
+def _compare(results, baseline, tolerance):
+    problems = []
+    for name, result in results.items():
+        if result['failures']:
+            problems.append(f'{name}: {result["failures"]} failed requests')
+        expected = baseline.get('scenarios', {}).get(name)
+        if expected is None:
+            continue
+        # cache fills make the count vary a little with thread timing
+        if result['sql_per_request'] > expected['sql_per_request'] + SQL_SLACK:
+            problems.append(f'{name}: {result["sql_per_request"]:.1f} statements per request, '
+                            f'baseline {expected["sql_per_request"]:.1f}')
+        if result['p95_ms'] > expected['p95_ms'] * tolerance:
+            problems.append(f'{name}: p95 {result["p95_ms"]:.1f} ms, baseline {expected["p95_ms"]:.1f} ms '
+                            f'(tolerance x{tolerance})')
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_scale_arguments(parser)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=100, help='Requests per scenario.')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--tolerance', type=float, default=2.0, help='Allowed p95 slowdown factor.')
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_database(args.database_uri or f'sqlite:///{os.path.join(tmp, "lifecycle.db")}')
+        from sqlalchemy import event
+        from app import create_app
+        from models import db
+
+        app = create_app()
+        with app.app_context():
+            seeded = seed_from_args(args)
+            event.listen(db.engine, 'before_cursor_execute', _count_statement)
+            db.session.remove()
+
+        results = {}
+        print(f'{"scenario":<15}{"requests":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"req/s":>9}{"sql/req":>9}{"sql max":>9}')
+        for name, operations in _scenarios(app, seeded, args):
+            result = results[name] = _run(app, operations, args.threads)
+            print(f'{name:<15}{result["requests"]:>9}{result["p50_ms"]:>9.1f}{result["p95_ms"]:>9.1f}'
+                  f'{result["p99_ms"]:>9.1f}{result["throughput"]:>9.1f}{result["sql_per_request"]:>9.1f}'
+                  f'{result["sql_max"]:>9}')
+
+    scale = dict(scale_of(args), threads=args.threads, requests=args.requests)
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        scenarios = {name: {field: round(value, 2) for field, value in result.items()}
+                     for name, result in results.items()}
+        with open(args.baseline, 'w') as f:
+            json.dump({'scale': scale, 'scenarios': scenarios}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'baseline written to {args.baseline}')
+        return
+
+    if not os.path.exists(args.baseline):
+        raise SystemExit(f'no baseline at {args.baseline}; run with --update-baseline first')
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('scale') != scale:
+        raise SystemExit(f'baseline was recorded at {baseline.get("scale")}, this run is {scale}')
+    problems = _compare(results, baseline, args.tolerance)
+    if problems:
+        raise SystemExit('regressions against the baseline:\n  ' + '\n  '.join(problems))
+    print('within the baseline')
+
+
+if __name__ == '__main__':
+    main()
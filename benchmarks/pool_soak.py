@@ -0,0 +1,175 @@
+"""Soak test of the gunicorn profile: steady load, stable connection pool.
+
+Seeds a SQLite database, starts gunicorn with gunicorn.conf.py and keeps
+``--clients`` logged-in learners browsing (dashboard, quiz start page,
+scores, summary, leaderboard) for ``--duration`` seconds while /metrics is
+sampled. It fails when a request errors, a worker ever holds more
+connections than DB_POOL_SIZE + DB_MAX_OVERFLOW, connections stay checked
+out once the load stops, the pool audit reports a leak, or the last third of
+the run is much slower than the first.
+
+    python -m benchmarks.pool_soak --clients 32 --duration 60 --worker-class gthread
+"""
+import argparse
+import http.cookiejar
+import os
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from benchmarks.seed import PASSWORD, configure_database, seed
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(base, process, seconds=30):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit('gunicorn exited during startup:\n' + process.stderr.read()[-2000:])
+        try:
+            urllib.request.urlopen(base + '/', timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit('gunicorn did not start')
+
+
+def _pool_sample(base):
+    text = urllib.request.urlopen(base + '/metrics', timeout=10).read().decode()
+    return {name: int(value) for name, value in re.findall(r'^(quiz_db_\w+) (\d+)$', text, re.M)}
+
+
+def _client(base, username, quiz_ids, deadline, samples, errors):
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+    opener.open(base + '/login', urllib.parse.urlencode({'username': username, 'password': PASSWORD}).encode(),
+                timeout=30).read()
+    rng = random.Random(username)
+    paths = ['/user/dashboard', '/user/score', '/user/summary']
+    while time.monotonic() < deadline:
+        quiz_id = rng.choice(quiz_ids)
+        path = rng.choice(paths + [f'/quiz/start/{quiz_id}', f'/quiz/{quiz_id}/leaderboard'])
+        start = time.perf_counter()
+        try:
+            opener.open(base + path, timeout=60).read()
+        except (urllib.error.URLError, OSError) as e:
+            errors.append(f'{path}: {e}')
+            continue
+        samples.append((time.monotonic(), time.perf_counter() - start))
+
+
+def _window_stats(samples):
+    latencies = sorted(latency for _, latency in samples)
+    if not latencies:
+        return 0, 0.0
+    return len(latencies), latencies[min(int(0.95 * len(latencies)), len(latencies) - 1)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--duration', type=int, default=30, help='Seconds of load.')
+    parser.add_argument('--worker-class', default='gthread', choices=('sync', 'gthread', 'gevent'))
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--pool-size', type=int, default=4)
+    parser.add_argument('--max-overflow', type=int, default=2)
+    parser.add_argument('--users', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = f'sqlite:///{os.path.join(tmp, "soak.db")}'
+        configure_database(uri)
+        from app import create_app
+        with create_app().app_context():
+            seeded = seed(users=args.users, attempts=args.users * 2)
+
+        port = _free_port()
+        base = f'http://127.0.0.1:{port}'
+        env = dict(
+            os.environ, SQLALCHEMY_DATABASE_URI=uri, BIND=f'127.0.0.1:{port}', WORKER_CLASS=args.worker_class,
+            WEB_CONCURRENCY=str(args.workers), THREADS=str(args.threads), DB_POOL_SIZE=str(args.pool_size),
+            DB_MAX_OVERFLOW=str(args.max_overflow), SLOW_REQUEST_MS='60000',
+            # no quiz cache refills during the idle check at the end
+            QUIZ_CACHE_PREWARM_INTERVAL=str(10 ** 6),
+        )
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'), 'app:create_app()'],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        )
+        try:
+            _wait_for(base, server)
+            samples, errors, pool = [], [], []
+            start = time.monotonic()
+            deadline = start + args.duration
+            clients = [
+                threading.Thread(target=_client, args=(base, f'learner{seeded["learner_ids"][i % args.users] - 2}',
+                                                       seeded['quiz_ids'], deadline, samples, errors))
+                for i in range(args.clients)
+            ]
+            for client in clients:
+                client.start()
+            while time.monotonic() < deadline:
+                pool.append(_pool_sample(base))
+                time.sleep(0.5)
+            for client in clients:
+                client.join()
+
+            # every worker answers a few of these once the load has drained
+            time.sleep(1)
+            idle = [_pool_sample(base) for _ in range(args.workers * 5)]
+        finally:
+            server.terminate()
+            _, log = server.communicate(timeout=30)
+
+    leak_lines = [line for line in log.splitlines() if 'connection_leak' in line]
+    latencies = sorted(latency for _, latency in samples)
+    third = args.duration / 3
+    first = _window_stats([s for s in samples if s[0] < start + third])
+    last = _window_stats([s for s in samples if s[0] >= deadline - third])
+    peak = max(sample['quiz_db_pool_checked_out'] for sample in pool)
+    limit = args.pool_size + args.max_overflow
+
+    threads = args.threads if args.worker_class == 'gthread' else 1
+    print(f'{args.worker_class}: {args.workers} workers x {threads} threads, {args.clients} clients, '
+          f'pool {args.pool_size}+{args.max_overflow}')
+    print(f'requests {len(latencies)}, errors {len(errors)}, {len(latencies) / args.duration:.1f} req/s, '
+          f'p50 {statistics.median(latencies) * 1000:.1f} ms, '
+          f'p95 {latencies[int(0.95 * (len(latencies) - 1))] * 1000:.1f} ms, '
+          f'p99 {latencies[int(0.99 * (len(latencies) - 1))] * 1000:.1f} ms')
+    print(f'first third {first[0]} requests p95 {first[1]:.1f} ms, last third {last[0]} requests p95 {last[1]:.1f} ms')
+    print(f'checked out connections per worker: peak {peak} of {limit}, '
+          f'after the load {max(sample["quiz_db_pool_checked_out"] for sample in idle)}, '
+          f'leaks {max(sample["quiz_db_connection_leaks_total"] for sample in idle)}')
+
+    problems = errors[:5]
+    if peak > limit:
+        problems.append(f'a worker held {peak} connections, the pool allows {limit}')
+    if any(sample['quiz_db_pool_checked_out'] for sample in idle):
+        problems.append('connections still checked out after the load')
+    if leak_lines or any(sample['quiz_db_connection_leaks_total'] for sample in idle):
+        problems.append('the pool audit reported leaked connections')
+    if last[0] < first[0] / 2 or last[1] > first[1] * 2:
+        problems.append('throughput or p95 degraded over the run')
+    if problems:
+        raise SystemExit('soak test failed:\n  ' + '\n  '.join(problems))
+    print('pool usage stable')
+
+
+if __name__ == '__main__':
+    main()
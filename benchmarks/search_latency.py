@@ -0,0 +1,77 @@
+"""Search latency against table size and result size.
+
+Seeds a throwaway SQLite database with a growing number of users of which a
+fixed number match the query, then the reverse, and prints the median time of
+``search_index.search`` for each backend. With an index the time should follow
+the number of matches, not the number of rows.
+
+    python -m benchmarks.search_latency --sizes 1000 10000 50000 --matches 20
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+
+def _make_app(path):
+    os.environ['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    from app import create_app
+    return create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+
+
+def _seed(users, matches):
+    from models import db, User
+    from search_index import rebuild_index
+    db.drop_all()
+    db.create_all()
+    rows = [
+        {'username': f'zephyr{i}' if i < matches else f'learner{i}', 'password': '-',
+         'name': f'User {i}', 'qualification': '-', 'dob': '2000-01-01'}
+        for i in range(users)
+    ]
+    db.session.execute(User.__table__.insert(), rows)
+    db.session.commit()
+    rebuild_index()
+
+
+def _time_search(backend, repeat):
+    from flask import current_app
+    from search_index import search, _backends
+    current_app.config['SEARCH_BACKEND'] = backend
+    current_app.config['SEARCH_RESULT_LIMIT'] = 10 ** 9
+    _backends.clear()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        found = search('user', 'zephyr')
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000, len(found)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--matches', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=25)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = _make_app(os.path.join(tmp, 'search.db'))
+        from models import db
+        with app.app_context():
+            print(f'{"users":>8} {"matches":>8} {"backend":>12} {"median ms":>10}')
+            cases = [(size, args.matches) for size in args.sizes]
+            cases += [(args.sizes[-1], m) for m in (args.matches * 10, args.matches * 100) if m <= args.sizes[-1]]
+            for users, matches in cases:
+                _seed(users, matches)
+                for backend in ('auto', 'like'):
+                    ms, found = _time_search(backend, args.repeat)
+                    from search_index import get_backend
+                    print(f'{users:>8} {found:>8} {get_backend().name:>12} {ms:>10.2f}')
+            db.session.remove()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Statement count of the admin search page as the number of matches grows.
+
+Seeds learners with attempts, renders /search/result for a query matching all
+of them and fails if any run needs more than --max-queries statements.
+
+    python -m benchmarks.search_queries --users 10 100 1000
+"""
+import argparse
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+
+def _seed(users):
+    from werkzeug.security import generate_password_hash
+    from models import db, User, Subject, Chapter, Quiz, QuizResult
+    from search_index import rebuild_index
+    db.drop_all()
+    db.create_all()
+    db.session.add(User(username='admin', password=generate_password_hash('admin'), name='Admin',
+                        qualification='-', dob='2000-01-01', is_admin=True))
+    subject = Subject(subjectId='S1', sub_name='Subject')
+    chapter = Chapter(chapterId='C1', chapter_name='Chapter', subject=subject)
+    quizzes = [Quiz(quizId=f'Q{i}', title=f'Quiz {i}', number_of_questions=1, duration=1,
+                    due_date=datetime.now() + timedelta(days=1), subject=subject, chapter=chapter)
+               for i in range(3)]
+    db.session.add_all([subject, chapter, *quizzes])
+    db.session.flush()
+    learners = [{'username': f'learner{i}', 'password': '-', 'name': f'Learner {i}',
+                 'qualification': '-', 'dob': '2000-01-01'} for i in range(users)]
+    db.session.execute(User.__table__.insert(), learners)
+    learner_ids = db.session.execute(db.select(User.id).where(User.is_admin == False)).scalars().all()
+    db.session.execute(QuizResult.__table__.insert(), [
+        {'user_id': user_id, 'quiz_id': quiz.id, 'score': 1, 'total_marks': 1,
+         'total_questions': 1, 'quiz_attempt_date': datetime.now()}
+        for user_id in learner_ids for quiz in quizzes
+    ])
+    db.session.commit()
+    rebuild_index()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--max-queries', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(tmp, "search.db")}'
+        os.environ.setdefault('SECRET_KEY', 'benchmark')
+        from app import create_app
+        from models import db
+        from query_counter import assert_max_queries
+        app = create_app({'SEARCH_RESULT_LIMIT': 10 ** 9})
+
+        for users in args.users:
+            with app.app_context():
+                _seed(users)
+            client = app.test_client()
+            client.post('/login', data={'username': 'admin', 'password': 'admin'})
+            with app.app_context(), assert_max_queries(args.max_queries) as counter:
+                response = client.post('/search/result', data={'search': 'learner'})
+            assert response.status_code == 200, response.status_code
+            print(f'{users:>6} matching users: {counter.count} statements')
+            with app.app_context():
+                db.session.remove()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""Seed a database at a chosen scale for the benchmarks.
+
+Everything is written with bulk Core inserts, so large scales seed in
+seconds. Learners are ``learner<i>`` and the admin is ``admin``; every
+password is ``bench``, hashed with a single iteration to keep logins cheap.
+
+    python -m benchmarks.seed --database-uri sqlite:////tmp/bench.db --users 1000 --attempts 5000
+"""
+import argparse
+import os
+import random
+from datetime import datetime, timedelta
+
+PASSWORD = 'bench'
+HASH_METHOD = 'pbkdf2:sha256:1'
+BATCH_SIZE = 5000
+
+
+def _insert(table, rows):
+    from models import db
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(table.insert(), rows[start:start + BATCH_SIZE])
+
+
+def seed(users=200, subjects=2, chapters=3, questions=40, attempts=400, quiz_questions=20, seed_value=0):
+    """Recreate the schema and fill it; returns the ids the scenarios need.
+
+    There is one quiz per chapter asking ``quiz_questions`` of the chapter's
+    ``questions``. ``attempts`` results (with their answers) are spread over
+    the quizzes, at most one per learner and quiz.
+    """
+    from werkzeug.security import generate_password_hash
+    from models import db, User, Subject, Chapter, Question, Quiz, QuizResult, UserAnswer
+    from search_index import rebuild_index
+    from stats import rebuild_stats
+
+    rng = random.Random(seed_value)
+    db.drop_all()
+    db.create_all()
+    now = datetime.now()
+    password = generate_password_hash(PASSWORD, method=HASH_METHOD)
+
+    _insert(User.__table__, [
+        {'id': 1, 'username': 'admin', 'password': password, 'name': 'Admin', 'qualification': '-',
+         'dob': '2000-01-01', 'is_admin': True},
+        *[{'id': i + 2, 'username': f'learner{i}', 'password': password, 'name': f'Learner {i}',
+           'qualification': '-', 'dob': '2000-01-01', 'is_admin': False} for i in range(users)],
+    ])
+    learner_ids = list(range(2, users + 2))
+
+    _insert(Subject.__table__, [
+        {'id': s + 1, 'subjectId': f'S{s}', 'sub_name': f'Subject {s}', 'description': '-'}
+        for s in range(subjects)
+    ])
+    chapter_rows, question_rows, quiz_rows = [], [], []
+    for s in range(subjects):
+        for c in range(chapters):
+            chapter_id = len(chapter_rows) + 1
+            chapter_rows.append({'id': chapter_id, 'chapterId': f'C{chapter_id}', 'chapter_name': f'Chapter {chapter_id}',
+                                 'description': '-', 'subject_id': s + 1})
+            for q in range(questions):
+                question_rows.append({
+                    'id': len(question_rows) + 1, 'questionId': f'Q{chapter_id}-{q}', 'title': f'Question {q}?',
+                    'option1': 'a', 'option2': 'b', 'option3': 'c', 'option4': 'd',
+                    'correct_option': str(rng.randint(1, 4)), 'marks': rng.randint(1, 3),
+                    'chapter_id': chapter_id, 'created_at': now,
+                })
+            quiz_rows.append({
+                'id': chapter_id, 'quizId': f'QZ{chapter_id}', 'title': f'Quiz {chapter_id}', 'description': '-',
+                'number_of_questions': quiz_questions, 'duration': 30, 'due_date': now + timedelta(days=1),
+                'subject_id': s + 1, 'chapter_id': chapter_id, 'is_deleted': False,
+            })
+    _insert(Chapter.__table__, chapter_rows)
+    _insert(Question.__table__, question_rows)
+    _insert(Quiz.__table__, quiz_rows)
+
+    # quiz id -> its questions' (id, correct option, marks)
+    bank = {}
+    for question in question_rows:
+        bank.setdefault(question['chapter_id'], []).append(question)
+    pairs = rng.sample([(user_id, quiz['id']) for user_id in learner_ids for quiz in quiz_rows],
+                       min(attempts, len(learner_ids) * len(quiz_rows)))
+    result_rows, answer_rows = [], []
+    for user_id, quiz_id in pairs:
+        asked = rng.sample(bank[quiz_id], min(quiz_questions, len(bank[quiz_id])))
+        score = 0
+        for question in asked:
+            selected = str(rng.randint(1, 4))
+            score += question['marks'] if selected == question['correct_option'] else 0
+            answer_rows.append({'user_id': user_id, 'quiz_id': quiz_id, 'question_id': question['id'],
+                                'selected_option': selected})
+        result_rows.append({
+            'user_id': user_id, 'quiz_id': quiz_id, 'score': score,
+            'total_marks': sum(question['marks'] for question in asked), 'total_questions': len(asked),
+            'quiz_attempt_date': now - timedelta(minutes=rng.randint(0, 10000)),
+            'question_ids': ','.join(str(question['id']) for question in asked),
+        })
+    _insert(QuizResult.__table__, result_rows)
+    _insert(UserAnswer.__table__, answer_rows)
+    db.session.commit()
+
+    rebuild_stats()
+    rebuild_index()
+    attempted = {}
+    for user_id, quiz_id in pairs:
+        attempted.setdefault(user_id, set()).add(quiz_id)
+    return {
+        'learner_ids': learner_ids,
+        'quiz_ids': [quiz['id'] for quiz in quiz_rows],
+        'attempted': attempted,
+        'results': len(result_rows),
+        'answers': len(answer_rows),
+    }
+
+
+def add_scale_arguments(parser):
+    parser.add_argument('--database-uri', help='Defaults to a throwaway SQLite file.')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--subjects', type=int, default=2)
+    parser.add_argument('--chapters', type=int, default=3, help='Chapters per subject, one quiz each.')
+    parser.add_argument('--questions', type=int, default=40, help='Questions per chapter.')
+    parser.add_argument('--quiz-questions', type=int, default=20, help='Questions asked per attempt.')
+    parser.add_argument('--attempts', type=int, default=400)
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def scale_of(args):
+    return {name: getattr(args, name) for name in
+            ('users', 'subjects', 'chapters', 'questions', 'quiz_questions', 'attempts', 'seed')}
+
+
+def seed_from_args(args):
+    scale = scale_of(args)
+    return seed(seed_value=scale.pop('seed'), **scale)
+
+
+def configure_database(uri):
+    """Point the app at ``uri`` before it is imported."""
+    os.environ['SQLALCHEMY_DATABASE_URI'] = uri
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    # the seeded hashes stay as they are, and every learner may log in from the one address
+    os.environ.setdefault('PASSWORD_HASH_METHOD', HASH_METHOD)
+    os.environ.setdefault('LOGIN_ATTEMPTS_PER_IP', '0')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_scale_arguments(parser)
+    args = parser.parse_args()
+    if not args.database_uri:
+        parser.error('--database-uri is required when seeding on its own')
+    configure_database(args.database_uri)
+    from app import create_app
+    with create_app().app_context():
+        seeded = seed_from_args(args)
+    print(f"seeded {len(seeded['learner_ids'])} learners, {len(seeded['quiz_ids'])} quizzes, "
+          f"{seeded['results']} results, {seeded['answers']} answers")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Concurrent submits of one attempt must store exactly one result.
+
+Logs a learner in, renders the start page a few times (several tokens, as with
+a double render) and fires the submissions from parallel threads, repeated
+submits of the same token included. Fails unless exactly one QuizResult and one
+set of answers exist afterwards.
+
+    python -m benchmarks.submit_concurrency --threads 16 --rounds 5
+"""
+import argparse
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+
+def _seed(questions):
+    from werkzeug.security import generate_password_hash
+    from models import db, User, Subject, Chapter, Quiz, Question
+    db.drop_all()
+    db.create_all()
+    subject = Subject(subjectId='S1', sub_name='Subject')
+    chapter = Chapter(chapterId='C1', chapter_name='Chapter', subject=subject)
+    db.session.add_all([
+        User(username='learner', password=generate_password_hash('learner'), name='Learner',
+             qualification='-', dob='2000-01-01'),
+        subject, chapter,
+        Quiz(quizId='Q1', title='Quiz', number_of_questions=questions, duration=10,
+             due_date=datetime.now() + timedelta(days=1), subject=subject, chapter=chapter),
+        *[Question(questionId=f'Q{i}', title=f'Question {i}', option1='a', option2='b', option3='c',
+                   option4='d', correct_option='1', marks=1, chapter=chapter) for i in range(questions)],
+    ])
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--questions', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(tmp, "submit.db")}'
+        os.environ.setdefault('SECRET_KEY', 'benchmark')
+        from app import create_app
+        from models import db, QuizResult, UserAnswer
+        app = create_app()
+
+        for round_ in range(args.rounds):
+            with app.app_context():
+                _seed(args.questions)
+                db.session.remove()
+            client = app.test_client()
+            client.post('/login', data={'username': 'learner', 'password': 'learner'})
+
+            # a few renders, each submitted several times
+            forms = []
+            for _ in range(3):
+                page = client.get('/quiz/start/1').get_data(as_text=True)
+                form = {f'question_{qid}': '1' for qid in re.findall(r'name="question_(\d+)"', page)}
+                form['submission_token'] = re.search(r'name="submission_token" value="([^"]+)"', page).group(1)
+                forms.append(form)
+            cookie = client.get_cookie('session').value
+
+            def submit(form):
+                worker = app.test_client()
+                worker.set_cookie('session', cookie)
+                return worker.post('/submit/quiz/1', data=form).status_code
+
+            with ThreadPoolExecutor(max_workers=args.threads) as pool:
+                statuses = list(pool.map(submit, [forms[i % len(forms)] for i in range(args.threads)]))
+
+            with app.app_context():
+                results = QuizResult.query.count()
+                answers = UserAnswer.query.count()
+                db.session.remove()
+            print(f'round {round_ + 1}: {len(statuses)} submits -> {results} result, {answers} answers')
+            assert set(statuses) == {302}, statuses
+            assert results == 1, f'expected exactly one result, found {results}'
+            assert answers == args.questions, f'expected {args.questions} answers, found {answers}'
+
+
+if __name__ == '__main__':
+    main()
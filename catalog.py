@@ -0,0 +1,29 @@
+from sqlalchemy import select, func
+from sqlalchemy.orm import joinedload
+from models import db, Subject, Question
+
+
+def subject_tree():
+    """Subjects with their chapters, loaded in one joined query."""
+    return Subject.query.options(joinedload(Subject.chapters))
+
+
+def question_counts(chapter_ids):
+    """{chapter id: number of questions} from one grouped count.
+
+    Only the question index is read; question rows (and their text) are
+    never loaded.
+    """
+    chapter_ids = list(chapter_ids)
+    if not chapter_ids:
+        return {}
+    rows = db.session.execute(
+        select(Question.chapter_id, func.count(Question.id))
+        .where(Question.chapter_id.in_(chapter_ids))
+        .group_by(Question.chapter_id)
+    ).all()
+    return dict(rows)
+
+
+def chapter_ids_of(subjects):
+    return [chapter.id for subject in subjects for chapter in subject.chapters]
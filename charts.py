@@ -0,0 +1,67 @@
+from collections import OrderedDict
+from threading import Lock
+import hashlib
+import io
+import json
+
+# Maximum number of rendered charts kept in memory
+CHART_CACHE_SIZE = 512
+
+_chart_cache = OrderedDict()
+_chart_lock = Lock()
+
+
+def attempts_key(quiz_names, scores_percent):
+    """Hash of the attempts a chart is drawn from."""
+    payload = json.dumps([quiz_names, [round(s, 4) for s in scores_percent]])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def load_renderer():
+    """Import matplotlib, which takes about half a second, and return its Figure class."""
+    from matplotlib.figure import Figure
+    return Figure
+
+
+def _render_svg(quiz_names, scores_percent):
+    # matplotlib is imported on the first chart, so processes that never draw skip it
+    Figure = load_renderer()
+
+    # Object oriented API only: no pyplot global state, safe in threaded workers
+    fig = Figure(figsize=(10, 5))
+    ax = fig.subplots()
+    ax.bar(range(len(quiz_names)), scores_percent, color='skyblue')
+    ax.set_xticks(range(len(quiz_names)))
+    ax.set_xticklabels(quiz_names, rotation=45, ha='right')
+    ax.set_xlabel("Quizzes")
+    ax.set_ylabel("Scores (%)")
+    ax.set_title("Quiz Scores")
+    fig.tight_layout()
+
+    buffer = io.StringIO()
+    fig.savefig(buffer, format='svg')
+    return buffer.getvalue()
+
+
+def score_chart_svg(quiz_names, scores_percent):
+    """Return the score chart as an SVG string.
+
+    Charts are cached by a hash of the attempts, so repeat views with the
+    same attempts never reach matplotlib.
+    """
+    key = attempts_key(quiz_names, scores_percent)
+    with _chart_lock:
+        svg = _chart_cache.get(key)
+        if svg is not None:
+            _chart_cache.move_to_end(key)
+            return svg
+
+    svg = _render_svg(quiz_names, scores_percent)
+
+    with _chart_lock:
+        _chart_cache[key] = svg
+        _chart_cache.move_to_end(key)
+        # Evict the least recently used charts
+        while len(_chart_cache) > CHART_CACHE_SIZE:
+            _chart_cache.popitem(last=False)
+    return svg
@@ -0,0 +1,85 @@
+from flask import Blueprint
+import click
+
+from query_plans import find_sequential_scans
+from search_index import rebuild_index
+from answer_store import pack_existing_answers
+from stats import rebuild_stats
+from question_import import import_questions, detect_format
+from export import EXPORTS, FORMATS, export_chunks, gzip_chunks
+from models import db, Chapter
+
+# CLI commands, run with `flask --app app <command>`
+commands = Blueprint('commands', __name__, cli_group=None)
+
+
+@commands.cli.command('check-query-plans')
+def check_query_plans():
+    """Fail when a hot lookup would fall back to a sequential scan."""
+    failures = find_sequential_scans()
+    if not failures:
+        click.echo('All hot queries use an index.')
+        return
+
+    for name, plan in failures.items():
+        click.echo(f'Sequential scan in "{name}":', err=True)
+        for line in plan:
+            click.echo(f'    {line}', err=True)
+    raise SystemExit(1)
+
+
+@commands.cli.command('rebuild-search-index')
+def rebuild_search_index():
+    """Recreate the search documents from the users, subjects, chapters and quizzes."""
+    count = rebuild_index()
+    click.echo(f'Indexed {count} documents.')
+
+
+@commands.cli.command('pack-answers')
+@click.option('--batch-size', default=1000, show_default=True, help='Attempts converted per transaction.')
+@click.option('--delete-rows', is_flag=True, help='Delete the UserAnswer rows once packed.')
+def pack_answers(batch_size, delete_rows):
+    """Convert attempts stored as UserAnswer rows to packed answers."""
+    count = pack_existing_answers(batch_size, delete_rows, progress=lambda done: click.echo(f'{done} attempts packed'))
+    click.echo(f'Packed {count} attempts.')
+
+
+@commands.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Recompute the per-quiz and per-user statistics from the quiz results."""
+    quizzes, users = rebuild_stats()
+    click.echo(f'Rebuilt statistics for {quizzes} quizzes and {users} users.')
+
+
+@commands.cli.command('import-questions')
+@click.argument('chapter_id', type=int)
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'json']), help='Defaults to the file extension.')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows per INSERT.')
+def import_questions_command(chapter_id, path, fmt, batch_size):
+    """Add the questions of a CSV or JSON (Lines) file to a chapter."""
+    if db.session.get(Chapter, chapter_id) is None:
+        raise click.ClickException(f'Chapter {chapter_id} does not exist.')
+    with open(path, 'rb') as stream:
+        report = import_questions(chapter_id, stream, fmt or detect_format(path), batch_size)
+    if report.get('error'):
+        raise click.ClickException(report['error'])
+    for rejected in report['rejected']:
+        click.echo(f"row {rejected['row']} ({rejected['questionId'] or '-'}): {rejected['error']}", err=True)
+    click.echo(f"Imported {report['inserted']} questions, rejected {report['rejected_count']} rows.")
+
+
+@commands.cli.command('export')
+@click.argument('kind', type=click.Choice(list(EXPORTS)))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), default='csv', show_default=True)
+@click.option('--quiz-id', type=int)
+@click.option('--user-id', type=int)
+@click.option('--since', type=click.DateTime(), help='Attempts on or after this date.')
+@click.option('--until', type=click.DateTime(), help='Attempts before this date.')
+@click.option('--gzip', 'compress', is_flag=True, help='Write a gzip stream.')
+@click.option('--output', '-o', type=click.File('wb'), default='-', help='Defaults to standard output.')
+def export_command(kind, fmt, quiz_id, user_id, since, until, compress, output):
+    """Stream quiz results or answers as CSV or JSON Lines."""
+    chunks = export_chunks(kind, fmt, quiz_id=quiz_id, user_id=user_id, since=since, until=until)
+    for chunk in gzip_chunks(chunks) if compress else chunks:
+        output.write(chunk if compress else chunk.encode())
@@ -1,7 +1,16 @@
-from flask import Flask, render_template, request, flash, redirect, url_for, session, Blueprint
+from flask import Flask, render_template, request, flash, redirect, url_for, session, Blueprint, current_app, jsonify, Response, stream_with_context, abort
 
-from models import db, Subject, Chapter, Question, Quiz, User, QuizResult, UserAnswer
+from models import db, Subject, Chapter, Question, Quiz, User
 from routes import user_required, admin_required
+from identity import invalidate_user
+from purge import purge_quiz, purge_user, purge_subject
+from jobs import start_job, get_job
+from regrade import regrade_question
+from question_import import import_questions, detect_format
+from export import EXPORTS, FORMATS, export_chunks, gzip_chunks, parse_date
+from search_index import index_object, remove_documents
+from catalog import subject_tree, question_counts, chapter_ids_of
+from quiz_cache import invalidate_quiz, invalidate_chapter, invalidate_subject
 from datetime import datetime
 import json
 
@@ -30,6 +39,7 @@ def add_subject():
         
         new_subject = Subject(subjectId=subject_Id, sub_name=sub_name, description=description)
         db.session.add(new_subject)
+        index_object(new_subject)
         db.session.commit()
         flash('Subject added successfully', 'success')
         return redirect(url_for('main.admin_dashboard'))
@@ -52,7 +62,9 @@ def edit_subject(subject_id):
         subject.subjectId = subject_Id
         subject.sub_name = subject_name
         subject.description = description
+        index_object(subject)
         db.session.commit()
+        invalidate_subject(subject.id)
         flash('Subject updated successfully', 'success')
         return redirect(url_for('main.admin_dashboard'))
     return render_template('admin_side/crud_temp/edit_subject.html', subject=subject)
@@ -69,14 +81,9 @@ def delete_subject(subject_id):
         flash('Error deleting subject. Make sure there are no related quizzes.', 'info')
         return redirect(url_for('main.admin_dashboard'))
 
-    #delete related chapters
-    for chapter in subject.chapters:
-        db.session.delete(chapter)
-        db.session.commit()
-
+    #delete related chapters and their questions together with the subject
     try:
-        db.session.delete(subject)
-        db.session.commit()
+        purge_subject(subject_id)
         flash('Subject deleted successfully!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -101,6 +108,7 @@ def add_chapter(subject_id):
         
         new_chapter = Chapter(chapterId=chapter_Id,chapter_name=chapter_name, description=description, subject_id=subject_id)
         db.session.add(new_chapter)
+        index_object(new_chapter)
         db.session.commit()
         flash('Chapter added successfully', 'success')
         return redirect(url_for('main.admin_dashboard'))
@@ -118,6 +126,7 @@ def delete_chapter(chapter_id):
         return redirect(url_for('main.admin_dashboard'))
     
     db.session.delete(chapter)
+    remove_documents(['chapter'], [chapter_id])
     db.session.commit()
     flash('Chapter deleted successfully', 'success')
     return redirect(url_for('main.admin_dashboard'))
@@ -135,7 +144,9 @@ def edit_chapter(chapter_id):
         chapter.chapterId = chapter_Id
         chapter.chapter_name = chapter_name
         chapter.description = description
+        index_object(chapter)
         db.session.commit()
+        invalidate_chapter(chapter.id)
         flash('Chapter updated successfully', 'success')
         return redirect(url_for('main.admin_dashboard'))
     return render_template('admin_side/crud_temp/edit_chapter.html', chapter=chapter)
@@ -166,10 +177,31 @@ def add_question(chapter_id):
         new_question = Question(questionId=question_Id, title=question, option1=option1, option2=option2, option3=option3, option4=option4, correct_option=answer, marks=marks, chapter_id=chapter_id)
         db.session.add(new_question)
         db.session.commit()
+        invalidate_chapter(chapter_id)
         flash('Question added successfully', 'success')
         return redirect(url_for('crud.add_question', chapter_id=chapter_id))
     return render_template('admin_side/crud_temp/add_question.html', chapter_id=chapter_id)
 
+# Import questions route
+@crud.route('/admin/import/questions/<int:chapter_id>', methods=['GET', 'POST'])
+@admin_required
+def import_questions_route(chapter_id):
+    chapter = Chapter.query.get_or_404(chapter_id)
+    report = None
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash('Please choose a CSV or JSON file', 'danger')
+            return redirect(url_for('crud.import_questions_route', chapter_id=chapter_id))
+        # rows are validated and inserted while the upload streams past
+        report = import_questions(chapter_id, upload.stream, detect_format(upload.filename))
+        if report.get('error'):
+            flash(report['error'], 'danger')
+        else:
+            flash(f"Imported {report['inserted']} questions, rejected {report['rejected_count']} rows.",
+                  'success' if not report['rejected_count'] else 'warning')
+    return render_template('admin_side/crud_temp/import_questions.html', chapter=chapter, report=report)
+
 # View questions route
 @crud.route('/admin/view/questions/<int:chapter_id>', methods=['GET','POST'])
 @admin_required
@@ -188,6 +220,7 @@ def edit_question(question_id):
         flash("Question not found!", "danger")
         return redirect(url_for('main.admin_dashboard'))
     if request.method == 'POST':
+        graded_as = (question.correct_option, question.marks)
         question.questionId = request.form.get('questionId', question.questionId)
         question.title = request.form.get('question', question.title)
         question.option1 = request.form.get('option1', question.option1)
@@ -198,7 +231,13 @@ def edit_question(question_id):
         question.marks = request.form.get('marks', question.marks)
         try:
             db.session.commit()
-            flash("Question updated successfully!", "success")
+            invalidate_chapter(question.chapter_id)
+            # existing attempts are regraded in the background, the edit does not wait
+            if (str(question.correct_option), str(question.marks)) != tuple(map(str, graded_as)):
+                job_id = start_job('regrade', regrade_question, question.id)
+                flash(f"Question updated successfully! Regrading existing attempts (job {job_id}).", "success")
+            else:
+                flash("Question updated successfully!", "success")
             return redirect(url_for('crud.view_questions', chapter_id=question.chapter_id))
         except Exception as e:
             db.session.rollback()
@@ -213,6 +252,7 @@ def delete_question(question_id):
     question = Question.query.get(question_id)
     db.session.delete(question)
     db.session.commit()
+    invalidate_chapter(question.chapter_id)
     flash('Question deleted successfully', 'success')
     return redirect(url_for('crud.view_questions', chapter_id=question.chapter_id))
 
@@ -246,12 +286,14 @@ def create_quiz():
         # Creating new quiz
         new_quiz = Quiz(quizId=quiz_Id, title=title, description=description, subject_id=subject_id, chapter_id=chapter_id, number_of_questions=num_questions, duration=duration, due_date=due_date)
         db.session.add(new_quiz)
+        index_object(new_quiz)
         db.session.commit()
         flash('Quiz created successfully!', 'success')
         return redirect(url_for('main.view_quizzes'))
-    subjects = Subject.query.all()
+    subjects = subject_tree().all()
+    counts = question_counts(chapter_ids_of(subjects))
     chapters = {
-        subject.id: [{"id": ch.id, "name": ch.chapter_name, "question_count": len(ch.questions)} for ch in subject.chapters]
+        subject.id: [{"id": ch.id, "name": ch.chapter_name, "question_count": counts.get(ch.id, 0)} for ch in subject.chapters]
         for subject in subjects
     }
 
@@ -285,8 +327,10 @@ def edit_quiz(quiz_id):
         quiz.number_of_questions = num_questions
         quiz.duration = duration
         quiz.due_date = due_date
+        index_object(quiz)
 
         db.session.commit()
+        invalidate_quiz(quiz.id)
         flash('Quiz updated successfully!', 'success')
         return redirect(url_for('main.view_quizzes'))
 
@@ -307,17 +351,13 @@ def delete_quiz(quiz_id):
 @admin_required
 def permanently_delete_quiz(quiz_id):
     quiz = Quiz.query.get_or_404(quiz_id)
-    # delete quiz from QuizResult table
-    quiz_results = QuizResult.query.filter_by(quiz_id=quiz_id).all()
-    for quiz_result in quiz_results:
-        db.session.delete(quiz_result)
-    # delete quiz from UserAnswer table
-    user_answers = UserAnswer.query.filter_by(quiz_id=quiz_id).all()
-    for user_answer in user_answers:
-        db.session.delete(user_answer)
-    # delete quiz from Quiz table
-    db.session.delete(quiz)
-    db.session.commit()
+    # delete answers, results and the quiz with set-based chunked deletes
+    if request.args.get('background') == '1' or current_app.config.get('PURGE_IN_BACKGROUND'):
+        job_id = start_job('purge_quiz', purge_quiz, quiz.id)
+        flash(f"Quiz deletion started (job {job_id}).", "info")
+        return redirect(url_for('main.view_quizzes'))
+
+    purge_quiz(quiz.id)
     flash("Quiz permanently deleted successfully!", "success")
     return redirect(url_for('main.view_quizzes'))
 
@@ -337,16 +377,53 @@ def reactive_quiz(quiz_id):
 @admin_required
 def delete_user(user_id):
     user = User.query.get_or_404(user_id)
-    # delete user from QuizResult table
-    quiz_results = QuizResult.query.filter_by(user_id=user_id).all()
-    for quiz_result in quiz_results:
-        db.session.delete(quiz_result)
-    # delete user from UserAnswer table
-    user_answers = UserAnswer.query.filter_by(user_id=user_id).all()
-    for user_answer in user_answers:
-        db.session.delete(user_answer)
-    # delete user from User table
-    db.session.delete(user)
-    db.session.commit()
+    # stop trusting the user's session before the rows are removed
+    invalidate_user(user.id)
+    if request.args.get('background') == '1' or current_app.config.get('PURGE_IN_BACKGROUND'):
+        job_id = start_job('purge_user', purge_user, user.id)
+        flash(f"User deletion started (job {job_id}).", "info")
+        return redirect(url_for('main.user_list'))
+
+    purge_user(user.id)
     flash("User deleted successfully!", "success")
-    return redirect(url_for('main.user_list'))
\ No newline at end of file
+    return redirect(url_for('main.user_list'))
+
+# Route for background job progress
+@crud.route('/admin/jobs/<job_id>')
+@admin_required
+def job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+# Route for streaming exports of results and answers
+@crud.route('/admin/export/<kind>')
+@admin_required
+def export_data(kind):
+    fmt = request.args.get('format', 'csv')
+    if kind not in EXPORTS or fmt not in FORMATS:
+        abort(404)
+    try:
+        filters = {
+            'quiz_id': request.args.get('quiz_id', type=int),
+            'user_id': request.args.get('user_id', type=int),
+            'since': parse_date(request.args.get('since')),
+            'until': parse_date(request.args.get('until')),
+        }
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+
+    # rows are read with a server-side cursor and sent chunk by chunk
+    chunks = export_chunks(kind, fmt, **filters)
+    filename = f'{kind}.{fmt}'
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    if request.args.get('gzip') == '1':
+        chunks = gzip_chunks(chunks)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'},
+    )
@@ -0,0 +1,133 @@
+from sqlalchemy import select, and_
+from datetime import datetime
+import csv
+import io
+import json
+import zlib
+from models import db, User, Quiz, QuizResult, UserAnswer
+from answer_store import unpack
+
+DEFAULT_CHUNK_SIZE = 1000
+FORMATS = ('csv', 'jsonl')
+
+RESULT_COLUMNS = ('id', 'user_id', 'username', 'quiz_id', 'quizId', 'score', 'total_marks',
+                  'total_questions', 'quiz_attempt_date')
+ANSWER_COLUMNS = ('user_id', 'quiz_id', 'question_id', 'selected_option')
+
+
+def parse_date(value):
+    """YYYY-MM-DD or ISO datetime, None for empty; ValueError otherwise."""
+    return datetime.fromisoformat(value) if value else None
+
+
+def _result_filters(quiz_id=None, user_id=None, since=None, until=None):
+    conditions = []
+    if quiz_id:
+        conditions.append(QuizResult.quiz_id == quiz_id)
+    if user_id:
+        conditions.append(QuizResult.user_id == user_id)
+    if since:
+        conditions.append(QuizResult.quiz_attempt_date >= since)
+    if until:
+        conditions.append(QuizResult.quiz_attempt_date < until)
+    return conditions
+
+
+def _stream(stmt, chunk_size):
+    """Rows of ``stmt`` from a server-side cursor, ``chunk_size`` at a time."""
+    return db.session.execute(stmt.execution_options(yield_per=chunk_size))
+
+
+def _result_rows(filters, chunk_size):
+    stmt = (
+        select(QuizResult.id, QuizResult.user_id, User.username, QuizResult.quiz_id, Quiz.quizId,
+               QuizResult.score, QuizResult.total_marks, QuizResult.total_questions,
+               QuizResult.quiz_attempt_date)
+        .join(User, User.id == QuizResult.user_id)
+        .join(Quiz, Quiz.id == QuizResult.quiz_id)
+        .where(*_result_filters(**filters))
+        .order_by(QuizResult.id)
+    )
+    for row in _stream(stmt, chunk_size):
+        yield row._asdict()
+
+
+def _answer_rows(filters, chunk_size):
+    # rows stored one per answer
+    stmt = (
+        select(UserAnswer.user_id, UserAnswer.quiz_id, UserAnswer.question_id, UserAnswer.selected_option)
+        .order_by(UserAnswer.id)
+    )
+    if filters.get('quiz_id'):
+        stmt = stmt.where(UserAnswer.quiz_id == filters['quiz_id'])
+    if filters.get('user_id'):
+        stmt = stmt.where(UserAnswer.user_id == filters['user_id'])
+    if filters.get('since') or filters.get('until'):
+        # the attempt date lives on QuizResult
+        stmt = (
+            stmt.join(QuizResult, and_(QuizResult.user_id == UserAnswer.user_id,
+                                       QuizResult.quiz_id == UserAnswer.quiz_id))
+            .where(*_result_filters(since=filters.get('since'), until=filters.get('until')))
+        )
+    for row in _stream(stmt, chunk_size):
+        yield row._asdict()
+
+    # attempts stored in the packed format, expanded to the same rows
+    packed = (
+        select(QuizResult.user_id, QuizResult.quiz_id, QuizResult.question_ids, QuizResult.packed_answers)
+        .where(QuizResult.packed_answers.isnot(None), *_result_filters(**filters))
+        .order_by(QuizResult.id)
+    )
+    for attempt in _stream(packed, chunk_size):
+        for question_id, selected_option in unpack(attempt.question_ids, attempt.packed_answers).items():
+            yield {'user_id': attempt.user_id, 'quiz_id': attempt.quiz_id,
+                   'question_id': question_id, 'selected_option': selected_option}
+
+
+EXPORTS = {
+    'results': (RESULT_COLUMNS, _result_rows),
+    'answers': (ANSWER_COLUMNS, _answer_rows),
+}
+
+
+def _jsonable(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def export_chunks(kind, fmt='csv', chunk_size=DEFAULT_CHUNK_SIZE, **filters):
+    """Text chunks of an export, each covering up to ``chunk_size`` rows.
+
+    Only one chunk of rows is held at a time, so memory does not grow with
+    the size of the export.
+    """
+    columns, rows = EXPORTS[kind]
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, lineterminator='\n') if fmt == 'csv' else None
+    if writer:
+        writer.writeheader()
+
+    pending = 0
+    for row in rows(filters, chunk_size):
+        if writer:
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps({column: _jsonable(row[column]) for column in columns}))
+            buffer.write('\n')
+        pending += 1
+        if pending >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_chunks(chunks):
+    """Compress text chunks into a gzip stream as they are produced."""
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
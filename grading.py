@@ -0,0 +1,110 @@
+from sqlalchemy import insert
+import hashlib
+import numpy as np
+from models import db, Quiz, Question, UserAnswer
+from quiz_cache import cached
+
+# stored for questions left blank, as before
+NOT_ANSWERED = "Not Answered"
+
+
+def option_code(value):
+    """'1'..'4' -> 1..4; anything else (blank, invalid) -> 0."""
+    if value and len(value) == 1 and value in '1234':
+        return int(value)
+    return 0
+
+
+class AnswerKey:
+    """Compact answer key of one quiz: question ids, correct option codes and marks as arrays.
+
+    ``version`` is a digest of those arrays, equal for keys built from the same
+    questions, answers and marks.
+    """
+    __slots__ = ('quiz_id', 'chapter_id', 'subject_id', 'number_of_questions',
+                 'question_ids', 'correct', 'marks', 'total_marks', 'version')
+
+    def __init__(self, quiz_id, chapter_id, subject_id, number_of_questions, question_ids, correct, marks):
+        self.quiz_id = quiz_id
+        self.chapter_id = chapter_id
+        self.subject_id = subject_id
+        self.number_of_questions = number_of_questions
+        self.question_ids = np.asarray(question_ids, dtype=np.int64)
+        self.correct = np.asarray(correct, dtype=np.int8)
+        self.marks = np.asarray(marks, dtype=np.int64)
+        self.total_marks = int(self.marks.sum())
+        digest = hashlib.blake2b(digest_size=8)
+        for array in (self.question_ids, self.correct, self.marks):
+            digest.update(array.tobytes())
+        self.version = digest.hexdigest()
+
+    def __len__(self):
+        return len(self.question_ids)
+
+    def subset(self, positions):
+        """Answer key of the questions at ``positions``, in that order."""
+        return AnswerKey(
+            self.quiz_id, self.chapter_id, self.subject_id, self.number_of_questions,
+            self.question_ids[positions], self.correct[positions], self.marks[positions],
+        )
+
+    def selected_from_form(self, form):
+        """Selected option codes in answer key order (0 = not answered)."""
+        return np.fromiter(
+            (option_code(form.get(f'question_{question_id}')) for question_id in self.question_ids.tolist()),
+            dtype=np.int8,
+            count=len(self),
+        )
+
+    def score(self, selected):
+        """Score of one submission."""
+        return int(self.marks[selected == self.correct].sum())
+
+    def score_batch(self, selected):
+        """Scores of many submissions at once; ``selected`` is (submissions x questions)."""
+        selected = np.asarray(selected, dtype=np.int8).reshape(-1, len(self))
+        return (selected == self.correct) @ self.marks
+
+
+def _build_answer_key(quiz_id):
+    quiz = (
+        db.session.query(Quiz.id, Quiz.chapter_id, Quiz.subject_id, Quiz.number_of_questions)
+        .filter(Quiz.id == quiz_id)
+        .first()
+    )
+    if quiz is None:
+        return None
+    rows = (
+        db.session.query(Question.id, Question.correct_option, Question.marks)
+        .filter(Question.chapter_id == quiz.chapter_id)
+        .order_by(Question.id)
+        .all()
+    )
+    return AnswerKey(
+        quiz.id, quiz.chapter_id, quiz.subject_id, quiz.number_of_questions,
+        [row.id for row in rows],
+        # -1 never matches a selection, so a malformed stored answer scores nothing
+        [option_code(row.correct_option) or -1 for row in rows],
+        [row.marks for row in rows],
+    )
+
+
+def get_answer_key(quiz_id):
+    """Answer key of a quiz, cached and invalidated together with the quiz payload."""
+    return cached('answer_key', quiz_id, _build_answer_key)
+
+
+def insert_answers(user_id, key, selected):
+    """Store a submission's answers with one multi-row INSERT."""
+    if not len(key):
+        return
+    rows = [
+        {
+            'user_id': user_id,
+            'quiz_id': key.quiz_id,
+            'question_id': question_id,
+            'selected_option': str(code) if code else NOT_ANSWERED,
+        }
+        for question_id, code in zip(key.question_ids.tolist(), selected.tolist())
+    ]
+    db.session.execute(insert(UserAnswer).values(rows))
@@ -0,0 +1,67 @@
+"""Gunicorn settings, read from the environment.
+
+    gunicorn 'app:create_app()'                                  # gthread, 4 threads per worker
+    WORKER_CLASS=sync WEB_CONCURRENCY=8 gunicorn 'app:create_app()'
+    WORKER_CLASS=gevent gunicorn 'app:create_app()'              # needs gevent (and psycogreen for Postgres)
+
+Gunicorn reads this file from the working directory. Every worker has its
+own SQLAlchemy pool, so the database sees up to
+workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections; the total is logged
+at startup.
+"""
+import multiprocessing
+import os
+
+WORKER_CLASSES = ('sync', 'gthread', 'gevent')
+
+worker_class = os.getenv('WORKER_CLASS', 'gthread')
+if worker_class not in WORKER_CLASSES:
+    raise RuntimeError(f'WORKER_CLASS must be one of {", ".join(WORKER_CLASSES)}, not {worker_class!r}')
+
+bind = os.getenv('BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('THREADS', 4)) if worker_class == 'gthread' else 1
+# greenlets per gevent worker
+worker_connections = int(os.getenv('WORKER_CONNECTIONS', 100))
+timeout = int(os.getenv('WORKER_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('KEEPALIVE', 5))
+# restart workers now and then so slow leaks cannot build up
+max_requests = int(os.getenv('MAX_REQUESTS', 0))
+max_requests_jitter = int(os.getenv('MAX_REQUESTS_JITTER', 0))
+accesslog = os.getenv('ACCESS_LOG') or None
+
+# gevent patches the standard library in each worker after the fork, which is
+# too late for an app imported by the master, so gevent workers load their own
+preload_app = os.getenv('PRELOAD', 'true').lower() == 'true' and worker_class != 'gevent'
+if preload_app:
+    # import matplotlib once in the master; workers share the pages after the fork
+    os.environ.setdefault('PRELOAD_HEAVY_IMPORTS', 'true')
+
+# one connection per thread; a sync worker serves one request at a time, plus background jobs
+if worker_class == 'gthread':
+    os.environ.setdefault('DB_POOL_SIZE', str(threads))
+elif worker_class == 'sync':
+    os.environ.setdefault('DB_POOL_SIZE', '2')
+
+
+def when_ready(server):
+    per_worker = int(os.getenv('DB_POOL_SIZE', 5)) + int(os.getenv('DB_MAX_OVERFLOW', 10))
+    server.log.info(f'{workers} {worker_class} workers, up to {workers * per_worker} database connections')
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from pooling import dispose_after_fork
+        dispose_after_fork(server.app.callable)
+
+
+def post_worker_init(worker):
+    if worker_class != 'gevent':
+        return
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        worker.log.warning('psycogreen is not installed; Postgres queries block the whole gevent worker')
+    else:
+        patch_psycopg()
@@ -0,0 +1,121 @@
+from flask import g, session, current_app
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+from sqlalchemy import select, delete, insert
+from collections import namedtuple
+from threading import Lock
+import time
+from models import db, User, ClaimRevocation
+
+# What the access decorators need to know about the logged in user
+Identity = namedtuple('Identity', ['id', 'is_admin'])
+
+# user_id -> time the user's claims were revoked (deleted or role changed); a per-process copy
+# of the claim_revocation table, reloaded every ROLE_CLAIM_REVOCATION_REFRESH seconds
+_revoked = {}
+_revoked_loaded_at = None
+_lock = Lock()
+
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt='role-claim')
+
+
+def issue_role_claim(user):
+    """Store a signed, versioned role claim for ``user`` in the session."""
+    session['role_claim'] = _serializer().dumps({
+        'id': user.id,
+        'is_admin': bool(user.is_admin),
+        'v': current_app.config.get('ROLE_CLAIM_VERSION', '1'),
+    })
+
+
+def invalidate_user(user_id):
+    """Stop trusting every role claim issued so far for ``user_id``.
+
+    Call this when a user is deleted or their role changes; the next request
+    of that user falls back to the database. The revocation is committed on
+    its own connection, so every worker sees it on its next reload.
+    """
+    now = time.time()
+    max_age = current_app.config.get('ROLE_CLAIM_MAX_AGE', 300)
+    with db.engine.begin() as connection:
+        # claims older than max_age are rejected anyway
+        connection.execute(delete(ClaimRevocation).where(
+            (ClaimRevocation.user_id == user_id) | (ClaimRevocation.revoked_at < now - max_age)))
+        connection.execute(insert(ClaimRevocation).values(user_id=user_id, revoked_at=now))
+    with _lock:
+        _revoked[user_id] = now
+    if g.get('identity') is not None and g.identity.id == user_id:
+        g.pop('identity', None)
+        g.pop('current_user', None)
+
+
+def _revoked_at(user_id):
+    """When ``user_id``'s claims were last revoked, from a copy at most ROLE_CLAIM_REVOCATION_REFRESH seconds old."""
+    global _revoked, _revoked_loaded_at
+    now = time.monotonic()
+    refresh = current_app.config.get('ROLE_CLAIM_REVOCATION_REFRESH', 1)
+    if _revoked_loaded_at is None or now - _revoked_loaded_at >= refresh:
+        since = time.time() - current_app.config.get('ROLE_CLAIM_MAX_AGE', 300)
+        rows = db.session.execute(
+            select(ClaimRevocation.user_id, ClaimRevocation.revoked_at).where(ClaimRevocation.revoked_at >= since)
+        ).all()
+        with _lock:
+            _revoked = dict(rows)
+            _revoked_loaded_at = now
+    return _revoked.get(user_id)
+
+
+def _identity_from_claim():
+    if not current_app.config.get('ROLE_CLAIM_TRUST'):
+        return None
+    token = session.get('role_claim')
+    if not token:
+        return None
+    try:
+        data, issued_at = _serializer().loads(
+            token,
+            max_age=current_app.config.get('ROLE_CLAIM_MAX_AGE', 300),
+            return_timestamp=True,
+        )
+    except BadSignature:
+        return None
+
+    if data.get('v') != current_app.config.get('ROLE_CLAIM_VERSION', '1'):
+        return None
+    if data.get('id') != session.get('id'):
+        return None
+    revoked_at = _revoked_at(data['id'])
+    if revoked_at is not None and issued_at.timestamp() <= revoked_at:
+        return None
+    return Identity(data['id'], bool(data['is_admin']))
+
+
+def get_current_user():
+    """Load the logged in User row, at most once per request."""
+    if 'current_user' not in g:
+        user_id = session.get('id')
+        g.current_user = db.session.get(User, user_id) if user_id is not None else None
+    return g.current_user
+
+
+def get_current_identity():
+    """Resolve the logged in identity, at most once per request.
+
+    A valid role claim is used without touching the database when
+    ROLE_CLAIM_TRUST is enabled; otherwise the user row is loaded.
+    """
+    if 'identity' in g:
+        return g.identity
+
+    identity = _identity_from_claim()
+    if identity is None:
+        user = get_current_user()
+        if user:
+            identity = Identity(user.id, bool(user.is_admin))
+            # Refresh a missing or stale claim so later requests can skip the lookup
+            if current_app.config.get('ROLE_CLAIM_TRUST'):
+                issue_role_claim(user)
+
+    g.identity = identity
+    return identity
@@ -0,0 +1,192 @@
+from flask import g, has_app_context, request, request_started, request_finished, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from collections import Counter
+from threading import Lock
+import ipaddress
+import json
+import time
+
+DEFAULT_SLOW_REQUEST_MS = 500
+DEFAULT_N_PLUS_ONE_THRESHOLD = 5
+# upper bounds, in seconds, of the request duration histogram
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# characters of a statement kept in the logs
+STATEMENT_PREVIEW = 300
+
+# (endpoint, method) -> totals since the process started
+_metrics = {}
+_lock = Lock()
+_engine_hooked = False
+
+
+def _state():
+    """Measurements of the request in progress, or None outside one."""
+    if not has_app_context():
+        return None
+    state = g.get('_request_metrics')
+    return state if state is not None and not state['finished'] else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    state = _state()
+    if state is not None:
+        state['statements'][statement] += 1
+        conn.info.setdefault('_statement_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('_statement_started')
+    state = _state()
+    if started and state is not None:
+        state['db_seconds'] += time.perf_counter() - started.pop()
+
+
+def _request_started(app, **extra):
+    g._request_metrics = {
+        'started': time.perf_counter(),
+        'statements': Counter(),
+        'db_seconds': 0.0,
+        'template_seconds': 0.0,
+        'template_depth': 0,
+        'template_started': 0.0,
+        'finished': False,
+    }
+
+
+def _before_render(app, template, context, **extra):
+    state = _state()
+    if state is not None:
+        # templates rendered from inside a template are already being timed
+        if state['template_depth'] == 0:
+            state['template_started'] = time.perf_counter()
+        state['template_depth'] += 1
+
+
+def _rendered(app, template, context, **extra):
+    state = _state()
+    if state is not None and state['template_depth']:
+        state['template_depth'] -= 1
+        if state['template_depth'] == 0:
+            state['template_seconds'] += time.perf_counter() - state['template_started']
+
+
+def _record(endpoint, method, wall, db_seconds, template_seconds, statements, n_plus_one):
+    with _lock:
+        totals = _metrics.get((endpoint, method))
+        if totals is None:
+            totals = _metrics[(endpoint, method)] = {
+                'requests': 0, 'wall_seconds': 0.0, 'db_seconds': 0.0, 'template_seconds': 0.0,
+                'statements': 0, 'n_plus_one': 0, 'buckets': [0] * len(DURATION_BUCKETS),
+            }
+        totals['requests'] += 1
+        totals['wall_seconds'] += wall
+        totals['db_seconds'] += db_seconds
+        totals['template_seconds'] += template_seconds
+        totals['statements'] += statements
+        totals['n_plus_one'] += n_plus_one
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if wall <= bound:
+                totals['buckets'][i] += 1
+
+
+def _request_finished(app, response, **extra):
+    state = g.get('_request_metrics')
+    if state is None or state['finished']:
+        return
+    state['finished'] = True
+    wall = time.perf_counter() - state['started']
+    endpoint = request.endpoint or 'unmatched'
+    statements = sum(state['statements'].values())
+
+    # the same SQL run again and again in one request is usually a query in a loop
+    threshold = app.config.get('N_PLUS_ONE_THRESHOLD', DEFAULT_N_PLUS_ONE_THRESHOLD)
+    repeated = [
+        {'statement': statement[:STATEMENT_PREVIEW], 'count': count}
+        for statement, count in state['statements'].most_common()
+        if count >= threshold
+    ]
+    _record(endpoint, request.method, wall, state['db_seconds'], state['template_seconds'], statements,
+            1 if repeated else 0)
+
+    entry = {
+        'endpoint': endpoint,
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'wall_ms': round(wall * 1000, 1),
+        'db_ms': round(state['db_seconds'] * 1000, 1),
+        'template_ms': round(state['template_seconds'] * 1000, 1),
+        'statements': statements,
+    }
+    if repeated:
+        app.logger.warning(json.dumps(dict(entry, event='n_plus_one', repeated=repeated)))
+    if wall * 1000 >= app.config.get('SLOW_REQUEST_MS', DEFAULT_SLOW_REQUEST_MS):
+        app.logger.warning(json.dumps(dict(entry, event='slow_request', repeated=repeated)))
+
+
+def init_instrumentation(app):
+    """Measure every request of ``app``: SQL statements and time, template time, wall time.
+
+    Statements are counted through engine events, so everything the request
+    runs through SQLAlchemy is included. Totals are per process.
+    """
+    global _engine_hooked
+    if not app.config.get('INSTRUMENTATION_ENABLED', True):
+        return
+    with _lock:
+        if not _engine_hooked:
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            _engine_hooked = True
+    request_started.connect(_request_started, app)
+    request_finished.connect(_request_finished, app)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+
+
+def metrics_allowed(remote_addr, allow_remote=False):
+    """/metrics is served to loopback clients unless remote scraping is allowed."""
+    if allow_remote:
+        return True
+    try:
+        return ipaddress.ip_address(remote_addr or '').is_loopback
+    except ValueError:
+        return False
+
+
+def _labels(endpoint, method, **extra):
+    labels = dict(endpoint=endpoint, method=method, **extra)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels.items()) + '}'
+
+
+def render_metrics():
+    """The collected totals in the Prometheus text exposition format."""
+    with _lock:
+        snapshot = {key: dict(totals, buckets=list(totals['buckets'])) for key, totals in _metrics.items()}
+
+    lines = [
+        '# HELP quiz_request_duration_seconds Wall time of a request.',
+        '# TYPE quiz_request_duration_seconds histogram',
+    ]
+    for (endpoint, method), totals in sorted(snapshot.items()):
+        for bound, count in zip(DURATION_BUCKETS, totals['buckets']):
+            lines.append(f'quiz_request_duration_seconds_bucket{_labels(endpoint, method, le=bound)} {count}')
+        lines.append(f'quiz_request_duration_seconds_bucket{_labels(endpoint, method, le="+Inf")} {totals["requests"]}')
+        lines.append(f'quiz_request_duration_seconds_sum{_labels(endpoint, method)} {totals["wall_seconds"]:.6f}')
+        lines.append(f'quiz_request_duration_seconds_count{_labels(endpoint, method)} {totals["requests"]}')
+
+    counters = (
+        ('quiz_request_db_seconds_total', 'db_seconds', 'Time spent executing SQL statements.'),
+        ('quiz_request_template_seconds_total', 'template_seconds', 'Time spent rendering templates.'),
+        ('quiz_request_statements_total', 'statements', 'SQL statements executed.'),
+        ('quiz_request_n_plus_one_total', 'n_plus_one', 'Requests that repeated one statement past the threshold.'),
+    )
+    for name, field, help_text in counters:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for (endpoint, method), totals in sorted(snapshot.items()):
+            value = totals[field]
+            lines.append(f'{name}{_labels(endpoint, method)} {value:.6f}' if isinstance(value, float)
+                         else f'{name}{_labels(endpoint, method)} {value}')
+    return '\n'.join(lines) + '\n'
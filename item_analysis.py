@@ -0,0 +1,258 @@
+from flask import current_app
+from sqlalchemy import select, func
+from threading import Lock
+import numpy as np
+from models import db, QuizResult, UserAnswer, QuizStats
+from grading import get_answer_key, option_code
+from jobs import start_job
+
+DEFAULT_CHUNK_SIZE = 5000
+# share of learners in the upper and lower groups of the discrimination index
+GROUP_FRACTION = 0.27
+NOT_ASKED = -1
+
+# quiz_id -> {'attempts': n, 'version': answer key version, 'report': dict}
+_reports = {}
+# quiz_id -> id of the job computing its report
+_running = {}
+_lock = Lock()
+
+
+def _attempt_count(quiz_id):
+    return db.session.execute(select(QuizStats.attempts).where(QuizStats.quiz_id == quiz_id)).scalar() or 0
+
+
+def _positions(sorted_ids, ids):
+    """Index of each of ``ids`` in ``sorted_ids`` and a mask of the ones found."""
+    positions = np.searchsorted(sorted_ids, ids)
+    found = positions < len(sorted_ids)
+    found[found] = sorted_ids[positions[found]] == ids[found]
+    return positions, found
+
+
+def _chunks(key, chunk_size, last_id):
+    """Yield (user_ids, matrix, columns) for up to ``chunk_size`` attempts at a time.
+
+    Attempts are walked by user id with keyset pagination. ``matrix`` holds the
+    option codes of the chunk's attempts (-1 where not asked), but only for
+    ``columns``, the positions in the key of the questions the chunk touches.
+    Memory is bounded by the chunk, not by attempts x bank size.
+    """
+    after = None
+    while True:
+        query = (
+            select(QuizResult.user_id, QuizResult.question_ids, QuizResult.packed_answers)
+            .where(QuizResult.quiz_id == key.quiz_id, QuizResult.id <= last_id)
+        )
+        if after is not None:
+            query = query.where(QuizResult.user_id > after)
+        attempts = db.session.execute(query.order_by(QuizResult.user_id).limit(chunk_size)).all()
+        if not attempts:
+            return
+        user_ids = np.fromiter((attempt.user_id for attempt in attempts), dtype=np.int64, count=len(attempts))
+        after = int(user_ids[-1])
+
+        # (attempt, key position, option code) of every answer in the chunk
+        rows, cols, codes = [], [], []
+        for index, attempt in enumerate(attempts):
+            if attempt.packed_answers is not None and attempt.question_ids:
+                question_ids = np.array(attempt.question_ids.split(','), dtype=np.int64)
+                packed = np.frombuffer(attempt.packed_answers.encode(), dtype=np.uint8).astype(np.int8) - ord('0')
+                positions, found = _positions(key.question_ids, question_ids)
+                rows.append(np.full(found.sum(), index, dtype=np.int64))
+                cols.append(positions[found])
+                codes.append(packed[found])
+
+        answers = db.session.execute(
+            select(UserAnswer.user_id, UserAnswer.question_id, UserAnswer.selected_option)
+            .where(UserAnswer.quiz_id == key.quiz_id, UserAnswer.user_id.between(int(user_ids[0]), after))
+            .execution_options(yield_per=chunk_size)
+        )
+        for part in answers.partitions():
+            positions, found_rows = _positions(user_ids, np.fromiter((answer.user_id for answer in part), dtype=np.int64, count=len(part)))
+            columns, found_cols = _positions(key.question_ids, np.fromiter((answer.question_id for answer in part), dtype=np.int64, count=len(part)))
+            found = found_rows & found_cols
+            rows.append(positions[found])
+            cols.append(columns[found])
+            codes.append(np.fromiter((option_code(answer.selected_option) for answer in part), dtype=np.int8, count=len(part))[found])
+
+        rows, cols, codes = (np.concatenate(parts) if parts else np.zeros(0, dtype) for parts, dtype in
+                             ((rows, np.int64), (cols, np.int64), (codes, np.int8)))
+        columns, cols = np.unique(cols, return_inverse=True)
+        matrix = np.full((len(attempts), len(columns)), NOT_ASKED, dtype=np.int8)
+        matrix[rows, cols] = codes
+        yield user_ids, matrix, columns
+
+
+def _ratio(numerator, denominator):
+    return np.divide(numerator, denominator, out=np.full(np.shape(numerator), np.nan), where=denominator > 0)
+
+
+def _marked(key, matrix, columns):
+    """Asked and correct masks of a chunk."""
+    asked = matrix != NOT_ASKED
+    return asked, (matrix == key.correct[columns]) & asked
+
+
+def analyse(key, chunks, progress=None):
+    """Item statistics from ``chunks()``, an iterator factory of (user_ids, matrix, columns).
+
+    - difficulty: share of correct answers among learners asked the question
+    - discrimination: difficulty in the top 27% minus the bottom 27% by score
+    - distractors: share of learners choosing each option, and leaving it blank
+    - reliability: Cronbach's alpha (KR-20 for right/wrong items) from the
+      mean item variance and the mean inter-item covariance. The covariance
+      comes from how far each attempt's number of correct answers is from
+      the sum of the difficulties of the questions it was asked, so sampled
+      attempts still count and only per-question state is kept.
+
+    The first pass adds up per-question counts and keeps one percentage per
+    attempt. The groups for discrimination and the difficulties the
+    covariance needs are only known after it, so a second pass adds up the
+    rest.
+    """
+    progress = progress or (lambda **kwargs: None)
+    items = len(key)
+    asked_count = np.zeros(items, dtype=np.int64)
+    correct_count = np.zeros(items, dtype=np.int64)
+    option_count = np.zeros((items, 5), dtype=np.int64)
+    user_ids, percents = [], []
+    for chunk_users, matrix, columns in chunks():
+        asked, correct = _marked(key, matrix, columns)
+        asked_count[columns] += asked.sum(axis=0)
+        correct_count[columns] += correct.sum(axis=0)
+        for option in range(5):
+            option_count[columns, option] += ((matrix == option) & asked).sum(axis=0)
+        # percentage per attempt, so attempts with different samples compare
+        marks = key.marks[columns]
+        percents.append(_ratio(correct @ marks, asked @ marks))
+        user_ids.append(chunk_users)
+        progress(attempts=sum(map(len, user_ids)))
+    user_ids = np.concatenate(user_ids) if user_ids else np.zeros(0, dtype=np.int64)
+    percent = np.concatenate(percents) if percents else np.zeros(0)
+
+    difficulty = _ratio(correct_count, asked_count)
+    # variance of each right/wrong item over the learners asked it
+    variance = difficulty * (1 - difficulty)
+    order = np.argsort(np.nan_to_num(percent, nan=-1.0), kind='stable')
+    group = int(round(len(order) * GROUP_FRACTION))
+    # 1 for the upper group, -1 for the lower one, by position in user_ids
+    side = np.zeros(len(order), dtype=np.int8)
+    if group:
+        side[order[-group:]] = 1
+        side[order[:group]] = -1
+    # (asked, correct) counts per question of each group
+    upper = np.zeros((2, items), dtype=np.int64)
+    lower = np.zeros((2, items), dtype=np.int64)
+    # sums over attempts of the squared distance from the expected number correct, of the
+    # variances of the questions asked, and of the number of ordered pairs of questions asked
+    squares = item_variances = pairs = 0.0
+    ranked = 0
+    if len(user_ids):
+        for chunk_users, matrix, columns in chunks():
+            asked, correct = _marked(key, matrix, columns)
+            positions, found = _positions(user_ids, chunk_users)
+            # attempts deleted or added since the first pass are left out
+            asked, correct, positions = asked[found], correct[found], positions[found]
+            chunk_side = side[positions]
+            for counts, members in ((upper, chunk_side == 1), (lower, chunk_side == -1)):
+                counts[0, columns] += asked[members].sum(axis=0)
+                counts[1, columns] += correct[members].sum(axis=0)
+            asked_per_attempt = asked.sum(axis=1)
+            # a question only answered since the first pass has no difficulty yet
+            residual = correct.sum(axis=1) - asked @ np.nan_to_num(difficulty[columns])
+            squares += float(residual @ residual)
+            item_variances += float((asked @ np.nan_to_num(variance[columns])).sum())
+            pairs += float(asked_per_attempt @ (asked_per_attempt - 1))
+            ranked += len(chunk_users)
+            progress(ranked=ranked)
+    discrimination = _ratio(upper[1], upper[0]) - _ratio(lower[1], lower[0]) if group else np.full(items, np.nan)
+    distractors = _ratio(option_count, asked_count[:, None])
+
+    return {
+        'attempts': len(user_ids),
+        'questions': [
+            {
+                'question_id': question_id,
+                'asked': int(asked_count[index]),
+                'difficulty': _value(difficulty[index]),
+                'discrimination': _value(discrimination[index]),
+                'blank': _value(distractors[index, 0]),
+                'options': [_value(share) for share in distractors[index, 1:]],
+                'correct_option': int(key.correct[index]),
+            }
+            for index, question_id in enumerate(key.question_ids.tolist())
+        ],
+        'reliability': _reliability(variance[asked_count > 1], squares, item_variances, pairs, items),
+    }
+
+
+def _reliability(variances, squares, item_variances, pairs, items):
+    """Alpha for ``items`` questions from the mean item variance and the mean covariance.
+
+    Over all attempts, the squared distances from the expected number correct
+    add up to the variances plus the covariances of the pairs of questions
+    each attempt was asked. With every question asked this is exactly KR-20.
+    """
+    if items < 2 or not len(variances) or not pairs:
+        return None
+    mean_variance = float(np.mean(variances))
+    mean_covariance = (squares - item_variances) / pairs
+    denominator = mean_variance + (items - 1) * mean_covariance
+    if not denominator or np.isnan(denominator):
+        return None
+    return items * mean_covariance / denominator
+
+
+def _value(number):
+    return None if np.isnan(number) else float(number)
+
+
+def build_report(quiz_id, progress=None, chunk_size=None):
+    """Compute and cache the item analysis of a quiz."""
+    progress = progress or (lambda **kwargs: None)
+    chunk_size = chunk_size or current_app.config.get('ITEM_ANALYSIS_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    key = get_answer_key(quiz_id)
+    if key is None:
+        return None
+    attempts = _attempt_count(quiz_id)
+    # attempts submitted after this are left for the next report
+    last_id = db.session.execute(select(func.max(QuizResult.id)).where(QuizResult.quiz_id == quiz_id)).scalar() or 0
+    report = analyse(key, lambda: _chunks(key, chunk_size, last_id), progress)
+    report['chapter_id'] = key.chapter_id
+    with _lock:
+        _reports[quiz_id] = {'attempts': attempts, 'version': key.version, 'report': report}
+    return report
+
+
+def get_report(quiz_id):
+    """Cached report of a quiz, or None when there is none or submissions arrived since.
+
+    A different answer key version (questions, answers or marks changed) also
+    makes the report stale.
+    """
+    with _lock:
+        entry = _reports.get(quiz_id)
+    if entry is None:
+        return None
+    key = get_answer_key(quiz_id)
+    if key is None or entry['attempts'] != _attempt_count(quiz_id) or entry['version'] != key.version:
+        return None
+    return entry['report']
+
+
+def _run(quiz_id, progress):
+    try:
+        build_report(quiz_id, progress)
+    finally:
+        with _lock:
+            _running.pop(quiz_id, None)
+
+
+def start_report(quiz_id):
+    """Start computing a quiz's report in the background; returns the job id."""
+    with _lock:
+        if quiz_id in _running:
+            return _running[quiz_id]
+        job_id = _running[quiz_id] = start_job('item_analysis', _run, quiz_id)
+    return job_id
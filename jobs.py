@@ -0,0 +1,66 @@
+from flask import current_app
+from threading import Thread, Lock
+from datetime import datetime
+from uuid import uuid4
+from models import db
+
+# Finished jobs kept around so their progress can still be read
+MAX_FINISHED_JOBS = 100
+
+_jobs = {}
+_jobs_lock = Lock()
+
+
+def _prune_finished():
+    finished = [job for job in _jobs.values() if job['status'] != 'running']
+    finished.sort(key=lambda job: job['finished_at'])
+    for job in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+        _jobs.pop(job['id'], None)
+
+
+def start_job(kind, func, *args, **kwargs):
+    """Run ``func(*args, progress=..., **kwargs)`` in a background thread.
+
+    ``progress`` is a callable taking keyword arguments, merged into the job's
+    progress dict. Returns the job id.
+    """
+    app = current_app._get_current_object()
+    job = {
+        'id': uuid4().hex,
+        'kind': kind,
+        'status': 'running',
+        'progress': {},
+        'error': None,
+        'started_at': datetime.now(),
+        'finished_at': None,
+    }
+
+    def report(**progress):
+        job['progress'].update(progress)
+
+    def run():
+        with app.app_context():
+            try:
+                func(*args, progress=report, **kwargs)
+                job['status'] = 'done'
+            except Exception as e:
+                db.session.rollback()
+                job['status'] = 'failed'
+                job['error'] = str(e)
+            finally:
+                job['finished_at'] = datetime.now()
+                db.session.remove()
+
+    with _jobs_lock:
+        _prune_finished()
+        _jobs[job['id']] = job
+    Thread(target=run, name=f'{kind}-{job["id"][:8]}', daemon=True).start()
+    return job['id']
+
+
+def get_job(job_id):
+    """Snapshot of a job's state, or None if it is unknown."""
+    job = _jobs.get(job_id)
+    if job is None:
+        return None
+    return dict(job, progress=dict(job['progress']))
@@ -0,0 +1,190 @@
+from flask import current_app
+from sqlalchemy import select
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from threading import Lock
+import time
+import numpy as np
+from models import db, QuizResult, Quiz, Chapter
+
+DEFAULT_TTL = 300
+DEFAULT_TOP = 10
+DEFAULT_CACHE_SIZE = 256
+
+
+class Leaderboard:
+    """Results of one quiz kept sorted by percentage, best first.
+
+    ``keys`` holds ``(-percent, attempt_id)`` in sorted order and ``users``
+    maps each user to their key, so a rank is one bisect and adding a
+    result is one insort.
+    """
+    __slots__ = ('keys', 'user_of', 'users', 'loaded_at', 'version')
+
+    def __init__(self, keys=(), user_of=None, users=None):
+        self.keys = list(keys)
+        self.user_of = user_of or {}
+        self.users = users or {}
+        self.loaded_at = time.monotonic()
+        self.version = None
+
+    @classmethod
+    def from_arrays(cls, attempt_ids, user_ids, scores, total_marks):
+        """Build from column arrays with one NumPy sort."""
+        attempt_ids = np.asarray(attempt_ids, dtype=np.int64)
+        scores = np.asarray(scores, dtype=np.float64)
+        total_marks = np.asarray(total_marks, dtype=np.float64)
+        percent = np.divide(scores * 100, total_marks, out=np.zeros_like(scores), where=total_marks > 0)
+        order = np.lexsort((attempt_ids, -percent))
+        keys = list(zip((-percent[order]).tolist(), attempt_ids[order].tolist()))
+        user_ids = np.asarray(user_ids, dtype=np.int64)[order].tolist()
+        return cls(keys, dict(zip((key[1] for key in keys), user_ids)), dict(zip(user_ids, keys)))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, user_id, attempt_id, percent):
+        if user_id in self.users:
+            return
+        key = (-percent, attempt_id)
+        insort(self.keys, key)
+        self.users[user_id] = key
+        self.user_of[attempt_id] = user_id
+
+    def remove_user(self, user_id):
+        key = self.users.pop(user_id, None)
+        if key is None:
+            return
+        del self.keys[bisect_left(self.keys, key)]
+        del self.user_of[key[1]]
+
+    def top(self, n):
+        """[(user_id, percent)] of the ``n`` best results; ties by earlier attempt."""
+        return [(self.user_of[attempt_id], -neg_percent) for neg_percent, attempt_id in self.keys[:n]]
+
+    def standing(self, user_id):
+        """Rank (ties share the best rank), percentile and percentage of a user, or None."""
+        key = self.users.get(user_id)
+        if key is None:
+            return None
+        rank = bisect_left(self.keys, (key[0], -1)) + 1
+        return {
+            'rank': rank,
+            'total': len(self.keys),
+            # share of results the user scored at least as well as
+            'percentile': 100.0 * (len(self.keys) - rank + 1) / len(self.keys),
+            'percent': -key[0],
+        }
+
+
+# quiz_id -> Leaderboard, built on first use, least recently used first
+_boards = OrderedDict()
+# quiz_id -> results added while that board was being built
+_building = {}
+_lock = Lock()
+
+
+def _build(quiz_id):
+    rows = db.session.execute(
+        select(QuizResult.id, QuizResult.user_id, QuizResult.score, QuizResult.total_marks)
+        .where(QuizResult.quiz_id == quiz_id)
+    ).all()
+    columns = list(zip(*rows)) or [(), (), (), ()]
+    return Leaderboard.from_arrays(*columns)
+
+
+def _version(quiz_id):
+    """questions_version of the quiz's chapter; regrades bump it once scores changed."""
+    return db.session.execute(
+        select(Chapter.questions_version).join(Quiz, Quiz.chapter_id == Chapter.id).where(Quiz.id == quiz_id)
+    ).scalar()
+
+
+def get_leaderboard(quiz_id, rebuild=False):
+    """Leaderboard of a quiz, rebuilt from the table after LEADERBOARD_TTL seconds.
+
+    A board is also rebuilt when its chapter's questions_version moved on, so
+    a regrade in any worker reaches every worker's boards. The TTL lets workers
+    that did not see a submission catch up. At most
+    LEADERBOARD_CACHE_SIZE boards are kept; expired ones are dropped whenever
+    a board is stored. ``rebuild`` skips the cached board.
+    """
+    config = current_app.config
+    ttl = config.get('LEADERBOARD_TTL', DEFAULT_TTL)
+    version = _version(quiz_id)
+    with _lock:
+        board = _boards.get(quiz_id)
+        if (not rebuild and board is not None and board.version == version
+                and time.monotonic() - board.loaded_at < ttl):
+            _boards.move_to_end(quiz_id)
+            return board
+        pending = _building.setdefault(quiz_id, [])
+
+    board = _build(quiz_id)
+    board.version = version
+
+    with _lock:
+        # results committed after our SELECT are replayed; add() skips known users
+        for user_id, attempt_id, percent in pending:
+            board.add(user_id, attempt_id, percent)
+        if _building.get(quiz_id) is pending:
+            del _building[quiz_id]
+        _boards[quiz_id] = board
+        _boards.move_to_end(quiz_id)
+        now = time.monotonic()
+        for expired in [key for key, cached in _boards.items() if now - cached.loaded_at >= ttl]:
+            del _boards[expired]
+        while len(_boards) > config.get('LEADERBOARD_CACHE_SIZE', DEFAULT_CACHE_SIZE):
+            _boards.popitem(last=False)
+    return board
+
+
+def record_result(attempt):
+    """Add a committed attempt to its quiz's leaderboard."""
+    percent = attempt.score * 100 / attempt.total_marks if attempt.total_marks else 0.0
+    entry = (attempt.user_id, attempt.id, percent)
+    with _lock:
+        if attempt.quiz_id in _building:
+            _building[attempt.quiz_id].append(entry)
+        board = _boards.get(attempt.quiz_id)
+        if board is not None:
+            board.add(*entry)
+
+
+def forget_quiz(quiz_id):
+    with _lock:
+        _boards.pop(quiz_id, None)
+
+
+def forget_user(user_id):
+    with _lock:
+        for board in _boards.values():
+            board.remove_user(user_id)
+
+
+def top_results(quiz_id, n=None):
+    """[(user_id, percent)] of the best results of a quiz."""
+    board = get_leaderboard(quiz_id)
+    with _lock:
+        return board.top(n or current_app.config.get('LEADERBOARD_TOP', DEFAULT_TOP))
+
+
+def user_standing(quiz_id, user_id):
+    """Rank and percentile of a user's result on a quiz, or None without one.
+
+    A result submitted through another worker is not on this worker's board
+    until it is rebuilt, so a user with a result but no entry gets a rebuild.
+    """
+    board = get_leaderboard(quiz_id)
+    with _lock:
+        standing = board.standing(user_id)
+    if standing is not None:
+        return standing
+    has_result = db.session.execute(
+        select(QuizResult.id).where(QuizResult.quiz_id == quiz_id, QuizResult.user_id == user_id)
+    ).first()
+    if has_result is None:
+        return None
+    board = get_leaderboard(quiz_id, rebuild=True)
+    with _lock:
+        return board.standing(user_id)
@@ -0,0 +1,57 @@
+from flask import current_app
+from collections import OrderedDict
+from threading import Lock
+import math
+import time
+
+DEFAULT_WINDOW = 60
+DEFAULT_PER_USER = 10
+DEFAULT_PER_IP = 300
+# buckets kept per process, least recently used dropped first
+MAX_BUCKETS = 100000
+
+# (kind, key) -> [tokens, last refill]
+_buckets = OrderedDict()
+_lock = Lock()
+
+
+def _refill(key, capacity, window, now):
+    """``key``'s bucket topped up to ``now``; seconds until it holds a token, or 0."""
+    refill = capacity / window
+    bucket = _buckets.get(key)
+    if bucket is None:
+        bucket = _buckets[key] = [float(capacity), now]
+        if len(_buckets) > MAX_BUCKETS:
+            _buckets.popitem(last=False)
+    else:
+        _buckets.move_to_end(key)
+        bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * refill)
+        bucket[1] = now
+    return bucket, (1 - bucket[0]) / refill if bucket[0] < 1 else 0
+
+
+def admit_login(username, remote_addr):
+    """None if a login attempt may go ahead, otherwise seconds to wait.
+
+    Each username and each client address gets a token bucket of
+    LOGIN_ATTEMPTS_PER_USER / LOGIN_ATTEMPTS_PER_IP attempts per
+    LOGIN_ATTEMPT_WINDOW seconds. The per-address limit is high because a
+    whole exam hall can share one address. Behind a reverse proxy the address
+    is only the client's when PROXY_FIX_X_FOR is set. Counts are per process,
+    so with N workers up to N times the limit gets through.
+    """
+    config = current_app.config
+    window = config.get('LOGIN_ATTEMPT_WINDOW', DEFAULT_WINDOW)
+    limits = (
+        (('user', username.lower()), config.get('LOGIN_ATTEMPTS_PER_USER', DEFAULT_PER_USER)),
+        (('ip', remote_addr or ''), config.get('LOGIN_ATTEMPTS_PER_IP', DEFAULT_PER_IP)),
+    )
+    now = time.monotonic()
+    with _lock:
+        buckets = [_refill(key, capacity, window, now) for key, capacity in limits if capacity]
+        wait = max((wait for _, wait in buckets), default=0)
+        # an attempt turned away by one limit does not use up the others
+        if not wait:
+            for bucket, _ in buckets:
+                bucket[0] -= 1
+    return math.ceil(wait) if wait else None
@@ -0,0 +1,74 @@
+"""hot lookup indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:34:15.314205
+
+Indexes for the per-request foreign-key lookups and one QuizResult per
+(user_id, quiz_id). Duplicate attempts left by double submits are removed
+first, keeping the earliest one.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('chapter', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_chapter_subject_id'), ['subject_id'], unique=False)
+
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_question_chapter_id'), ['chapter_id'], unique=False)
+
+    with op.batch_alter_table('quiz', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_quiz_chapter_id'), ['chapter_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_quiz_subject_id'), ['subject_id'], unique=False)
+
+    # keep the first attempt (and its answers) per user and quiz
+    op.execute(
+        "DELETE FROM quiz_result WHERE id NOT IN ("
+        "SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM quiz_result GROUP BY user_id, quiz_id) AS keep)"
+    )
+    op.execute(
+        "DELETE FROM user_answer WHERE id NOT IN ("
+        "SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM user_answer GROUP BY user_id, quiz_id, question_id) AS keep)"
+    )
+
+    with op.batch_alter_table('quiz_result', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_quiz_result_quiz_id'), ['quiz_id'], unique=False)
+        batch_op.create_unique_constraint('uq_quiz_result_user_quiz', ['user_id', 'quiz_id'])
+
+    with op.batch_alter_table('user_answer', schema=None) as batch_op:
+        batch_op.create_index('ix_user_answer_quiz_question', ['quiz_id', 'question_id'], unique=False)
+        batch_op.create_index('ix_user_answer_user_quiz', ['user_id', 'quiz_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('user_answer', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_answer_user_quiz')
+        batch_op.drop_index('ix_user_answer_quiz_question')
+
+    with op.batch_alter_table('quiz_result', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_quiz_result_user_quiz', type_='unique')
+        batch_op.drop_index(batch_op.f('ix_quiz_result_quiz_id'))
+
+    with op.batch_alter_table('quiz', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_quiz_subject_id'))
+        batch_op.drop_index(batch_op.f('ix_quiz_chapter_id'))
+
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_question_chapter_id'))
+
+    with op.batch_alter_table('chapter', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_chapter_subject_id'))
@@ -0,0 +1,80 @@
+"""search documents
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 09:38:18.043070
+
+search_document holds the searchable text of users, subjects, chapters and
+quizzes. It is indexed with an FTS5 trigram table on SQLite and a pg_trgm GIN
+index on Postgres, and filled from the existing rows.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SQLITE_UPGRADE = [
+    "CREATE VIRTUAL TABLE search_document_fts USING fts5("
+    "content, content='search_document', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER search_document_ai AFTER INSERT ON search_document BEGIN "
+    "INSERT INTO search_document_fts(rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER search_document_ad AFTER DELETE ON search_document BEGIN "
+    "INSERT INTO search_document_fts(search_document_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+    "CREATE TRIGGER search_document_au AFTER UPDATE ON search_document BEGIN "
+    "INSERT INTO search_document_fts(search_document_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+    "INSERT INTO search_document_fts(rowid, content) VALUES (new.id, new.content); END",
+]
+
+POSTGRES_UPGRADE = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX ix_search_document_content_trgm ON search_document USING gin (content gin_trgm_ops)",
+]
+
+# same text search_index._documents builds for new rows
+BACKFILL = [
+    "INSERT INTO search_document (entity, entity_id, content) "
+    "SELECT 'user', id, username || ' ' || name FROM \"user\"",
+    "INSERT INTO search_document (entity, entity_id, content) "
+    "SELECT 'subject', id, \"subjectId\" || ' ' || sub_name FROM subject",
+    "INSERT INTO search_document (entity, entity_id, content) "
+    "SELECT 'chapter', id, \"chapterId\" || ' ' || chapter_name FROM chapter",
+    "INSERT INTO search_document (entity, entity_id, content) "
+    "SELECT 'quiz', id, \"quizId\" || ' ' || title FROM quiz",
+    "INSERT INTO search_document (entity, entity_id, content) "
+    "SELECT 'quiz_topic', quiz.id, quiz.title || ' ' || subject.sub_name || ' ' || chapter.chapter_name "
+    "FROM quiz JOIN subject ON subject.id = quiz.subject_id JOIN chapter ON chapter.id = quiz.chapter_id",
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('search_document',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('entity', sa.String(length=20), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('entity', 'entity_id', name='uq_search_document_entity')
+    )
+
+    dialect = op.get_bind().dialect.name
+    statements = {'sqlite': SQLITE_UPGRADE, 'postgresql': POSTGRES_UPGRADE}.get(dialect, [])
+    for statement in statements + BACKFILL:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'sqlite':
+        for trigger in ('search_document_ai', 'search_document_ad', 'search_document_au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS search_document_fts")
+    op.drop_table('search_document')
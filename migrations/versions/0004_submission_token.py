@@ -0,0 +1,33 @@
+"""submission token
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 09:43:39.279200
+
+Remember which rendered start page an attempt came from, so a repeated POST
+of the same submission can be answered idempotently.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('quiz_result', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('submission_token', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('quiz_result', schema=None) as batch_op:
+        batch_op.drop_column('submission_token')
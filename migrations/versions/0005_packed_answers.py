@@ -0,0 +1,35 @@
+"""packed answers
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 09:44:43.439202
+
+Optional packed answer storage on quiz_result. Existing user_answer rows are
+converted separately, in batches, with `flask pack-answers`.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('quiz_result', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('question_ids', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('packed_answers', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('quiz_result', schema=None) as batch_op:
+        batch_op.drop_column('packed_answers')
+        batch_op.drop_column('question_ids')
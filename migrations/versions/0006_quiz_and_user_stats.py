@@ -0,0 +1,85 @@
+"""quiz and user stats
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 09:49:00.157618
+
+Running totals of the quiz results per quiz (count, score sums, percentage
+histogram) and per user (count, percentage sum), filled from the existing
+results. `flask rebuild-stats` recomputes them the same way.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _bucket(bucket):
+    # same integer comparisons as stats.bucket_of(); 100% falls in the last bucket
+    if bucket == 0:
+        condition = "total_marks <= 0 OR score * 10 < total_marks"
+    elif bucket == 9:
+        condition = f"total_marks > 0 AND score * 10 >= {bucket} * total_marks"
+    else:
+        condition = (f"total_marks > 0 AND score * 10 >= {bucket} * total_marks "
+                     f"AND score * 10 < {bucket + 1} * total_marks")
+    return f"SUM(CASE WHEN {condition} THEN 1 ELSE 0 END)"
+
+
+PERCENT = "SUM(CASE WHEN total_marks > 0 THEN score * 100.0 / total_marks ELSE 0.0 END)"
+
+BACKFILL = [
+    "INSERT INTO quiz_stats (quiz_id, attempts, score_sum, score_sq_sum, percent_sum, "
+    + ", ".join(f"hist_{bucket}" for bucket in range(10)) + ") "
+    "SELECT quiz_id, COUNT(id), SUM(score), SUM(score * score), " + PERCENT + ", "
+    + ", ".join(_bucket(bucket) for bucket in range(10))
+    + " FROM quiz_result GROUP BY quiz_id",
+    "INSERT INTO user_stats (user_id, attempts, score_sum, percent_sum) "
+    "SELECT user_id, COUNT(id), SUM(score), " + PERCENT + " FROM quiz_result GROUP BY user_id",
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('user_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('score_sum', sa.Integer(), nullable=False),
+    sa.Column('percent_sum', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('quiz_stats',
+    sa.Column('quiz_id', sa.Integer(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('score_sum', sa.Integer(), nullable=False),
+    sa.Column('score_sq_sum', sa.Integer(), nullable=False),
+    sa.Column('percent_sum', sa.Float(), nullable=False),
+    sa.Column('hist_0', sa.Integer(), nullable=False),
+    sa.Column('hist_1', sa.Integer(), nullable=False),
+    sa.Column('hist_2', sa.Integer(), nullable=False),
+    sa.Column('hist_3', sa.Integer(), nullable=False),
+    sa.Column('hist_4', sa.Integer(), nullable=False),
+    sa.Column('hist_5', sa.Integer(), nullable=False),
+    sa.Column('hist_6', sa.Integer(), nullable=False),
+    sa.Column('hist_7', sa.Integer(), nullable=False),
+    sa.Column('hist_8', sa.Integer(), nullable=False),
+    sa.Column('hist_9', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['quiz_id'], ['quiz.id'], ),
+    sa.PrimaryKeyConstraint('quiz_id')
+    )
+    for statement in BACKFILL:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('quiz_stats')
+    op.drop_table('user_stats')
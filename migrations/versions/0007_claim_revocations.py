@@ -0,0 +1,34 @@
+"""claim revocations
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 10:18:37.004632
+
+Role claim revocations shared by all workers. A process-local list only
+reached the worker that handled the deletion or role change.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('claim_revocation',
+    sa.Column('user_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('revoked_at', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('claim_revocation')
@@ -0,0 +1,34 @@
+"""chapter questions version
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 14:02:11.418305
+
+A counter per chapter bumped by every question edit, import and regrade.
+Workers compare it with the one their cached answer keys, quiz payloads and
+leaderboards were built from, instead of relying on an invalidation that
+only reached the worker handling the edit.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('chapter', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('questions_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('chapter', schema=None) as batch_op:
+        batch_op.drop_column('questions_version')
@@ -32,7 +32,9 @@ class Chapter(db.Model):
     description = db.Column(db.String(100), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.now)
     #foreign-key
-    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False, index=True)
+    # bumped whenever its questions or grades change, so every worker can tell its cached copies are stale
+    questions_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     #relationship for question
     questions = db.relationship('Question', backref='chapter', lazy=True, cascade="all, delete-orphan")
 
@@ -49,7 +51,7 @@ class Question(db.Model):
     marks = db.Column(db.Integer, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.now)
     #foreign-key
-    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), nullable=False)
+    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), nullable=False, index=True)
 
 class Quiz(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -65,8 +67,8 @@ class Quiz(db.Model):
     is_deleted = db.Column(db.Boolean, nullable=False, default=False) 
 
     #foreign-key
-    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False)
-    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), nullable=False)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False, index=True)
+    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), nullable=False, index=True)
 
     #relationship
     subject = db.relationship('Subject', backref='quizzes', lazy="joined")
@@ -80,20 +82,36 @@ class Quiz(db.Model):
 
 
 class QuizResult(db.Model):
+    # one attempt per user and quiz; also serves lookups by user_id alone
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'quiz_id', name='uq_quiz_result_user_quiz'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     score = db.Column(db.Integer, nullable=False)
     total_marks = db.Column(db.Integer, nullable=False)
     total_questions = db.Column(db.Integer, nullable=False)
     quiz_attempt_date = db.Column(db.DateTime, default=datetime.now)
+    # nonce of the start page the attempt was submitted from (see submissions.py)
+    submission_token = db.Column(db.String(64), nullable=True)
+    # packed answer storage (see answer_store.py): question ids of the attempt in
+    # order, and one option character per question ('0' = not answered)
+    question_ids = db.Column(db.Text, nullable=True)
+    packed_answers = db.Column(db.Text, nullable=True)
 
     #foreign-key
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False, index=True)
 
     #relationship
     quiz = db.relationship('Quiz', backref='answer', lazy=True)
 
 class UserAnswer(db.Model):
+    __table_args__ = (
+        db.Index('ix_user_answer_user_quiz', 'user_id', 'quiz_id'),
+        db.Index('ix_user_answer_quiz_question', 'quiz_id', 'question_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     selected_option = db.Column(db.String(1), nullable=False)
 
@@ -106,3 +124,48 @@ class UserAnswer(db.Model):
     user = db.relationship('User', backref='answers', lazy=True)
     question = db.relationship('Question', backref='answers', lazy=True)
     quiz = db.relationship('Quiz', backref='answers', lazy=True)
+
+class SearchDocument(db.Model):
+    """Searchable text for one User, Subject, Chapter or Quiz (see search_index.py)."""
+    __table_args__ = (
+        db.UniqueConstraint('entity', 'entity_id', name='uq_search_document_entity'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    content = db.Column(db.Text, nullable=False)
+
+class QuizStats(db.Model):
+    """Running totals over a quiz's attempts, maintained by stats.py."""
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Integer, nullable=False, default=0)
+    score_sq_sum = db.Column(db.Integer, nullable=False, default=0)
+    percent_sum = db.Column(db.Float, nullable=False, default=0.0)
+    # attempts per tenth of the percentage range; hist_9 includes 100%
+    hist_0 = db.Column(db.Integer, nullable=False, default=0)
+    hist_1 = db.Column(db.Integer, nullable=False, default=0)
+    hist_2 = db.Column(db.Integer, nullable=False, default=0)
+    hist_3 = db.Column(db.Integer, nullable=False, default=0)
+    hist_4 = db.Column(db.Integer, nullable=False, default=0)
+    hist_5 = db.Column(db.Integer, nullable=False, default=0)
+    hist_6 = db.Column(db.Integer, nullable=False, default=0)
+    hist_7 = db.Column(db.Integer, nullable=False, default=0)
+    hist_8 = db.Column(db.Integer, nullable=False, default=0)
+    hist_9 = db.Column(db.Integer, nullable=False, default=0)
+
+class UserStats(db.Model):
+    """Running totals over a user's attempts, maintained by stats.py."""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Integer, nullable=False, default=0)
+    percent_sum = db.Column(db.Float, nullable=False, default=0.0)
+
+class ClaimRevocation(db.Model):
+    """Role claims of a user issued up to revoked_at (epoch seconds) are no longer trusted.
+
+    No foreign key: the row has to outlive a deleted user until the claims expire.
+    """
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    revoked_at = db.Column(db.Float, nullable=False)
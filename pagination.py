@@ -0,0 +1,47 @@
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 200
+
+
+def clamp_per_page(per_page):
+    return min(max(per_page or DEFAULT_PER_PAGE, 1), MAX_PER_PAGE)
+
+
+def keyset_paginate(query, key, after=None, before=None, per_page=DEFAULT_PER_PAGE):
+    """Return one page of ``query`` ordered by the unique column ``key``.
+
+    Pages are addressed by the key of the last row seen (``after``) or the
+    first row of the following page (``before``) instead of an offset, so every
+    page is an index range scan no matter how deep into the table it is.
+    """
+    per_page = clamp_per_page(per_page)
+
+    if before is not None:
+        rows = query.filter(key < before).order_by(key.desc()).limit(per_page + 1).all()
+        has_prev = len(rows) > per_page
+        rows = list(reversed(rows[:per_page]))
+        has_next = True
+    else:
+        if after is not None:
+            query = query.filter(key > after)
+        rows = query.order_by(key).limit(per_page + 1).all()
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_prev = after is not None
+
+    return {
+        'items': rows,
+        'per_page': per_page,
+        'has_next': has_next and bool(rows),
+        'has_prev': has_prev,
+        'next_after': getattr(rows[-1], key.key) if rows else None,
+        'prev_before': getattr(rows[0], key.key) if rows else None,
+    }
+
+
+def page_args(request):
+    """Read the keyset cursor and page size from the query string."""
+    return {
+        'after': request.args.get('after', type=int),
+        'before': request.args.get('before', type=int),
+        'per_page': request.args.get('per_page', DEFAULT_PER_PAGE, type=int),
+    }
@@ -0,0 +1,86 @@
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock, BoundedSemaphore
+import multiprocessing
+import os
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_PENDING = 16
+DEFAULT_TIMEOUT = 10
+
+# per process: gunicorn workers forked from a preloaded master start their own pool
+_executor = None
+_slots = None
+_owner_pid = None
+_lock = Lock()
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _verify(stored, password):
+    return check_password_hash(stored, password)
+
+
+def _pool():
+    """(executor or None, semaphore) of this process, created on first use."""
+    global _executor, _slots, _owner_pid
+    with _lock:
+        if _owner_pid != os.getpid():
+            config = current_app.config
+            workers = config.get('PASSWORD_HASH_WORKERS', DEFAULT_WORKERS)
+            # spawned, not forked: forking a threaded worker can copy locks held by other threads
+            _executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) if workers else None
+            _slots = BoundedSemaphore(config.get('PASSWORD_HASH_MAX_PENDING', DEFAULT_MAX_PENDING))
+            _owner_pid = os.getpid()
+        return _executor, _slots
+
+
+def _run(func, *args):
+    """Result of ``func(*args)`` in the hashing pool, or None when it is saturated.
+
+    At most PASSWORD_HASH_MAX_PENDING hashes are queued or running per process;
+    anything beyond that is shed at once instead of waiting behind them.
+    """
+    global _owner_pid
+    executor, slots = _pool()
+    if not slots.acquire(blocking=False):
+        return None
+    try:
+        if executor is None:
+            return func(*args)
+        return executor.submit(func, *args).result(
+            timeout=current_app.config.get('PASSWORD_HASH_TIMEOUT', DEFAULT_TIMEOUT))
+    except FutureTimeout:
+        return None
+    except BrokenProcessPool:
+        # a hashing process died; its pool is shut down and the next call starts a new one
+        executor.shutdown(wait=False, cancel_futures=True)
+        with _lock:
+            if _executor is executor:
+                _owner_pid = None
+        return None
+    finally:
+        slots.release()
+
+
+def hash_password(password):
+    """Hash with PASSWORD_HASH_METHOD, or None when the hashing pool is saturated."""
+    return _run(_hash, password, current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD))
+
+
+def verify_password(stored, password):
+    """True or False, or None when the hashing pool is saturated."""
+    return _run(_verify, stored, password)
+
+
+def needs_rehash(stored):
+    """Whether ``stored`` was made with other parameters than PASSWORD_HASH_METHOD."""
+    method = current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+    stored_method = stored.split('$', 1)[0]
+    # 'scrypt' alone means werkzeug's default parameters, whatever they are
+    return stored_method != method and not stored_method.startswith(method + ':')
@@ -0,0 +1,114 @@
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event, make_url
+from sqlalchemy.pool import Pool, QueuePool
+from threading import Lock
+import json
+from models import db
+
+# connections checked out and not returned by the end of an app context
+_leaks = 0
+_lock = Lock()
+_pool_hooked = False
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS from the DB_POOL_* settings.
+
+    In-memory SQLite runs on a single shared connection, so it gets none.
+    """
+    uri = config.get('SQLALCHEMY_DATABASE_URI')
+    if not uri:
+        return {}
+    url = make_url(uri)
+    if url.drivername.startswith('sqlite') and url.database in (None, '', ':memory:'):
+        return {}
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+
+
+def _checkout(dbapi_connection, connection_record, connection_proxy):
+    if has_app_context():
+        g.setdefault('_checked_out', set()).add(id(connection_record))
+        # the request is gone by the time the app context is torn down
+        if has_request_context():
+            g._audit_endpoint = request.endpoint
+
+
+def _checkin(dbapi_connection, connection_record):
+    if has_app_context():
+        checked_out = g.get('_checked_out')
+        if checked_out:
+            checked_out.discard(id(connection_record))
+
+
+def _audit(error=None):
+    """Return the session's connection, then report any that are still out."""
+    global _leaks
+    db.session.remove()
+    leaked = len(g.get('_checked_out', ()))
+    if not leaked:
+        return
+    with _lock:
+        _leaks += leaked
+    current_app.logger.warning(json.dumps({
+        'event': 'connection_leak',
+        'connections': leaked,
+        'endpoint': g.get('_audit_endpoint'),
+    }))
+
+
+def init_pool_audit(app):
+    """Check at the end of every app context that its connections went back to the pool.
+
+    Requests, CLI commands and background jobs all run in an app context, so a
+    code path holding a connection past its context is logged and counted.
+    """
+    global _pool_hooked
+    with _lock:
+        if not _pool_hooked:
+            event.listen(Pool, 'checkout', _checkout)
+            event.listen(Pool, 'checkin', _checkin)
+            _pool_hooked = True
+    app.teardown_appcontext(_audit)
+
+
+def pool_status():
+    """Checked out, idle and overflow connections of the app's engines, plus leaks so far."""
+    status = {'checked_out': 0, 'idle': 0, 'overflow': 0, 'size': 0, 'leaks': _leaks}
+    for engine in db.engines.values():
+        pool = engine.pool
+        status['checked_out'] += pool.checkedout()
+        if isinstance(pool, QueuePool):
+            status['idle'] += pool.checkedin()
+            status['size'] += pool.size()
+            status['overflow'] += max(pool.overflow(), 0)
+    return status
+
+
+def render_pool_metrics():
+    """pool_status() in the Prometheus text exposition format."""
+    status = pool_status()
+    lines = []
+    for name, field, kind, help_text in (
+        ('quiz_db_pool_checked_out', 'checked_out', 'gauge', 'Connections in use.'),
+        ('quiz_db_pool_idle', 'idle', 'gauge', 'Connections idle in the pool.'),
+        ('quiz_db_pool_overflow', 'overflow', 'gauge', 'Connections open beyond the pool size.'),
+        ('quiz_db_pool_size', 'size', 'gauge', 'Configured pool size.'),
+        ('quiz_db_connection_leaks_total', 'leaks', 'counter', 'Connections still out when an app context ended.'),
+    ):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.append(f'{name} {status[field]}')
+    return '\n'.join(lines) + '\n'
+
+
+def dispose_after_fork(app):
+    """Drop connections inherited from the parent; each process opens its own."""
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
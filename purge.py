@@ -0,0 +1,104 @@
+from flask import current_app
+from sqlalchemy import select, delete
+from models import db, Subject, Chapter, Question, Quiz, User, QuizResult, UserAnswer
+from identity import invalidate_user
+from search_index import remove_documents
+from quiz_cache import invalidate_quiz
+from stats import remove_results, drop_quiz_stats, drop_user_stats
+from leaderboard import forget_quiz, forget_user
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def _no_progress(**progress):
+    pass
+
+
+def _chunk_size():
+    return current_app.config.get('PURGE_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+
+def delete_in_chunks(model, condition, chunk_size, progress=_no_progress, label=None):
+    """DELETE the rows of ``model`` matching ``condition``, one chunk per transaction.
+
+    Rows never reach the ORM; each chunk is a single
+    ``DELETE ... WHERE id IN (SELECT id ... LIMIT n)``.
+    """
+    label = label or model.__tablename__
+    deleted = 0
+    while True:
+        chunk = select(model.id).where(condition).limit(chunk_size).scalar_subquery()
+        result = db.session.execute(
+            delete(model).where(model.id.in_(chunk)),
+            execution_options={'synchronize_session': False},
+        )
+        db.session.commit()
+        deleted += result.rowcount
+        progress(**{label: deleted})
+        if result.rowcount < chunk_size:
+            return deleted
+
+
+def delete_results_in_chunks(condition, chunk_size, progress=_no_progress):
+    """DELETE the QuizResult rows matching ``condition`` chunk by chunk.
+
+    Each chunk is taken out of the statistics in the transaction that deletes it.
+    """
+    deleted = 0
+    while True:
+        results = db.session.execute(
+            select(QuizResult.id, QuizResult.user_id, QuizResult.quiz_id, QuizResult.score, QuizResult.total_marks)
+            .where(condition)
+            .limit(chunk_size)
+        ).all()
+        if results:
+            remove_results(results)
+            db.session.execute(
+                delete(QuizResult).where(QuizResult.id.in_([result.id for result in results])),
+                execution_options={'synchronize_session': False},
+            )
+        db.session.commit()
+        deleted += len(results)
+        progress(quiz_result=deleted)
+        if len(results) < chunk_size:
+            return deleted
+
+
+def purge_quiz(quiz_id, progress=_no_progress, chunk_size=None):
+    """Permanently delete a quiz with all of its attempts and answers."""
+    chunk_size = chunk_size or _chunk_size()
+    delete_in_chunks(UserAnswer, UserAnswer.quiz_id == quiz_id, chunk_size, progress)
+    delete_results_in_chunks(QuizResult.quiz_id == quiz_id, chunk_size, progress)
+    remove_documents(['quiz', 'quiz_topic'], [quiz_id])
+    drop_quiz_stats(quiz_id)
+    db.session.execute(delete(Quiz).where(Quiz.id == quiz_id), execution_options={'synchronize_session': False})
+    db.session.commit()
+    invalidate_quiz(quiz_id)
+    forget_quiz(quiz_id)
+    progress(quiz=1)
+
+
+def purge_user(user_id, progress=_no_progress, chunk_size=None):
+    """Permanently delete a user with all of their attempts and answers."""
+    chunk_size = chunk_size or _chunk_size()
+    delete_in_chunks(UserAnswer, UserAnswer.user_id == user_id, chunk_size, progress)
+    delete_results_in_chunks(QuizResult.user_id == user_id, chunk_size, progress)
+    remove_documents(['user'], [user_id])
+    drop_user_stats(user_id)
+    db.session.execute(delete(User).where(User.id == user_id), execution_options={'synchronize_session': False})
+    db.session.commit()
+    # claims issued while the purge was running are not trusted either
+    invalidate_user(user_id)
+    forget_user(user_id)
+    progress(user=1)
+
+
+def purge_subject(subject_id):
+    """Delete a subject with its chapters and questions in one transaction."""
+    chapter_ids = select(Chapter.id).where(Chapter.subject_id == subject_id).scalar_subquery()
+    remove_documents(['chapter'], chapter_ids)
+    remove_documents(['subject'], [subject_id])
+    db.session.execute(delete(Question).where(Question.chapter_id.in_(chapter_ids)), execution_options={'synchronize_session': False})
+    db.session.execute(delete(Chapter).where(Chapter.subject_id == subject_id), execution_options={'synchronize_session': False})
+    db.session.execute(delete(Subject).where(Subject.id == subject_id), execution_options={'synchronize_session': False})
+    db.session.commit()
@@ -0,0 +1,42 @@
+from contextlib import contextmanager
+from sqlalchemy import event
+from models import db
+
+
+class QueryCounter:
+    """SQL statements seen by the engine while the counter was active."""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@contextmanager
+def count_queries(engine=None):
+    """Record every statement the engine executes inside the block."""
+    engine = engine or db.engine
+    counter = QueryCounter()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter.statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+@contextmanager
+def assert_max_queries(limit, engine=None):
+    """Fail when the block executes more than ``limit`` statements."""
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        raise AssertionError(
+            f'{counter.count} statements executed, expected at most {limit}:\n'
+            + '\n'.join(counter.statements)
+        )
@@ -0,0 +1,45 @@
+from sqlalchemy import select, text
+from models import db, Quiz, Question, QuizResult, UserAnswer, Chapter
+
+
+def hot_queries(user_id=1, quiz_id=1, chapter_id=1, subject_id=1):
+    """The lookups routes.py runs on every dashboard, start, submit and review."""
+    return {
+        'attempt by user and quiz': select(QuizResult).where(QuizResult.user_id == user_id, QuizResult.quiz_id == quiz_id),
+        'attempts by user': select(QuizResult.quiz_id).where(QuizResult.user_id == user_id),
+        'attempts by quiz': select(QuizResult).where(QuizResult.quiz_id == quiz_id),
+        'answers by user and quiz': select(UserAnswer).where(UserAnswer.user_id == user_id, UserAnswer.quiz_id == quiz_id),
+        'questions by chapter': select(Question).where(Question.chapter_id == chapter_id),
+        'quizzes by subject': select(Quiz).where(Quiz.subject_id == subject_id),
+        'quizzes by chapter': select(Quiz).where(Quiz.chapter_id == chapter_id),
+        'chapters by subject': select(Chapter).where(Chapter.subject_id == subject_id),
+    }
+
+
+def _explain(connection, stmt):
+    sql = str(stmt.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True}))
+    if connection.dialect.name == 'sqlite':
+        rows = connection.execute(text('EXPLAIN QUERY PLAN ' + sql)).all()
+        return [row[-1] for row in rows]
+    # Postgres: forbid seq scans so the plan only shows one when no index can serve the query
+    connection.execute(text('SET LOCAL enable_seqscan = off'))
+    rows = connection.execute(text('EXPLAIN ' + sql)).all()
+    return [row[0] for row in rows]
+
+
+def _is_sequential_scan(line):
+    line = line.strip().lstrip('->').strip()
+    # SQLite: "SCAN quiz_result", Postgres: "Seq Scan on quiz_result"
+    return line.startswith('SCAN ') or line.startswith('Seq Scan')
+
+
+def find_sequential_scans(**params):
+    """Return {query name: plan lines} for hot queries that scan a whole table."""
+    failures = {}
+    with db.engine.connect() as connection:
+        for name, stmt in hot_queries(**params).items():
+            with connection.begin():
+                plan = _explain(connection, stmt)
+            if any(_is_sequential_scan(line) for line in plan):
+                failures[name] = plan
+    return failures
@@ -0,0 +1,155 @@
+from sqlalchemy import select, insert
+from datetime import datetime
+import csv
+import io
+import json
+from models import db, Question
+from quiz_cache import invalidate_chapter
+
+DEFAULT_BATCH_SIZE = 1000
+# rejected rows listed in the report; the count covers all of them
+MAX_REPORTED_REJECTIONS = 1000
+
+# column -> accepted names in the file, the first is the canonical one
+FIELDS = {
+    'questionId': ('questionId', 'question_id'),
+    'title': ('question', 'title'),
+    'option1': ('option1',),
+    'option2': ('option2',),
+    'option3': ('option3',),
+    'option4': ('option4',),
+    'correct_option': ('answer', 'correct_option'),
+    'marks': ('marks',),
+}
+
+
+def detect_format(filename):
+    """'csv' or 'json' from a file name; JSON covers arrays and JSON Lines."""
+    return 'json' if filename.lower().endswith(('.json', '.jsonl', '.ndjson')) else 'csv'
+
+
+def _records(text, fmt):
+    """(row number, dict) for every record of ``text``, read lazily.
+
+    CSV and JSON Lines are streamed; a JSON array is parsed in one piece.
+    """
+    if fmt == 'csv':
+        # row 1 is the header
+        for number, record in enumerate(csv.DictReader(text), start=2):
+            yield number, record
+        return
+
+    first = text.read(1)
+    while first.isspace():
+        first = text.read(1)
+    if first == '[':
+        for number, record in enumerate(json.loads(first + text.read()), start=1):
+            yield number, record
+        return
+    lines = _prepend(first, text) if first else ()
+    for number, line in enumerate(lines, start=1):
+        if line.strip():
+            try:
+                yield number, json.loads(line)
+            except ValueError:
+                yield number, None
+
+
+def _prepend(first, text):
+    yield first + text.readline()
+    yield from text
+
+
+def _value(record, names):
+    for name in names:
+        if record.get(name) is not None:
+            return str(record[name]).strip()
+    return ''
+
+
+def _validate(record):
+    """Column values of a question, or an error message."""
+    if not isinstance(record, dict):
+        return None, 'not a JSON object'
+    values = {column: _value(record, names) for column, names in FIELDS.items()}
+    missing = [names[0] for column, names in FIELDS.items() if not values[column]]
+    if missing:
+        return None, 'missing ' + ', '.join(missing)
+    if values['correct_option'] not in ('1', '2', '3', '4'):
+        return None, 'answer must be 1, 2, 3 or 4'
+    try:
+        values['marks'] = int(values['marks'])
+    except ValueError:
+        return None, 'marks must be a whole number'
+    if values['marks'] < 0:
+        return None, 'marks must not be negative'
+    if len(values['questionId']) > 50:
+        return None, 'questionId longer than 50 characters'
+    if any(len(values[f'option{n}']) > 200 for n in range(1, 5)):
+        return None, 'option longer than 200 characters'
+    return values, None
+
+
+def import_questions(chapter_id, stream, fmt='csv', batch_size=None):
+    """Add the questions of a CSV or JSON file to a chapter.
+
+    ``stream`` is a binary or text file object. Rows are validated while
+    the file streams past; duplicate questionIds are found with one query per
+    batch against the table plus a set of the ids already seen in the file.
+    Valid rows are inserted with one multi-row INSERT per batch and committed
+    together at the end. Returns a report of inserted and rejected rows.
+    """
+    batch_size = batch_size or DEFAULT_BATCH_SIZE
+    text = stream if isinstance(stream, io.TextIOBase) else io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    report = {'inserted': 0, 'rejected': [], 'rejected_count': 0}
+    seen = set()
+    batch = []
+
+    def reject(number, record, error):
+        report['rejected_count'] += 1
+        if len(report['rejected']) < MAX_REPORTED_REJECTIONS:
+            question_id = _value(record, FIELDS['questionId']) if isinstance(record, dict) else ''
+            report['rejected'].append({'row': number, 'questionId': question_id, 'error': error})
+
+    def flush():
+        if not batch:
+            return
+        existing = set(db.session.execute(
+            select(Question.questionId).where(Question.questionId.in_([values['questionId'] for _, values in batch]))
+        ).scalars())
+        rows = []
+        now = datetime.now()
+        for number, values in batch:
+            if values['questionId'] in existing:
+                reject(number, values, 'questionId already exists')
+            else:
+                rows.append(dict(values, chapter_id=chapter_id, created_at=now))
+        if rows:
+            db.session.execute(insert(Question).values(rows))
+            report['inserted'] += len(rows)
+        batch.clear()
+
+    try:
+        for number, record in _records(text, fmt):
+            values, error = _validate(record)
+            if error:
+                reject(number, record, error)
+                continue
+            if values['questionId'] in seen:
+                reject(number, values, 'questionId repeated in the file')
+                continue
+            seen.add(values['questionId'])
+            batch.append((number, values))
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+    except (csv.Error, ValueError, UnicodeDecodeError) as e:
+        db.session.rollback()
+        report['inserted'] = 0
+        report['error'] = f'Could not read the file: {e}'
+        return report
+
+    db.session.commit()
+    invalidate_chapter(chapter_id)
+    report['rejected'].sort(key=lambda rejected: rejected['row'])
+    return report
@@ -0,0 +1,53 @@
+import hashlib
+import numpy as np
+from models import Question
+
+
+def attempt_seed(user_id, quiz_id):
+    """Seed of a learner's question selection; stable across renders and workers."""
+    digest = hashlib.sha256(f'{quiz_id}:{user_id}'.encode()).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+def select_questions(key, user_id):
+    """Answer key of the questions one learner gets, in the order they are shown.
+
+    Samples ``number_of_questions`` of the chapter's questions (all of them when
+    the bank is smaller) and shuffles them, seeded by learner and quiz, so the
+    start page and the submission pick the same set from the cached id list.
+    """
+    count = len(key)
+    if key.number_of_questions and key.number_of_questions > 0:
+        count = min(count, key.number_of_questions)
+    rng = np.random.default_rng(attempt_seed(user_id, key.quiz_id))
+    return key.subset(rng.permutation(len(key))[:count])
+
+
+def key_for_ids(key, question_ids):
+    """Answer key of exactly ``question_ids``, in that order, or None if one is no longer in ``key``."""
+    question_ids = np.asarray(question_ids, dtype=np.int64)
+    positions = np.searchsorted(key.question_ids, question_ids)
+    if len(positions) and positions.max() >= len(key):
+        return None
+    if not np.array_equal(key.question_ids[positions], question_ids):
+        return None
+    return key.subset(positions)
+
+
+def questions_of_payload(payload, question_ids):
+    """The payload's questions for ``question_ids``, in that order."""
+    by_id = {question['id']: question for question in payload['questions']}
+    return [by_id[question_id] for question_id in question_ids if question_id in by_id]
+
+
+def attempt_questions(attempt, chapter_id):
+    """Questions of an attempt in the order they were asked.
+
+    Attempts from before per-attempt selection have no stored ids and were
+    asked every question of the chapter.
+    """
+    if not attempt.question_ids:
+        return Question.query.filter_by(chapter_id=chapter_id).order_by(Question.id).all()
+    question_ids = [int(question_id) for question_id in attempt.question_ids.split(',')]
+    by_id = {question.id: question for question in Question.query.filter(Question.id.in_(question_ids))}
+    return [by_id[question_id] for question_id in question_ids if question_id in by_id]
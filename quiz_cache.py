@@ -0,0 +1,189 @@
+from flask import current_app
+from collections import OrderedDict
+from threading import Lock, Thread
+from datetime import datetime, timedelta
+from sqlalchemy import select, update
+import os
+import time
+from models import db, Quiz, Question, Chapter
+
+DEFAULT_CACHE_SIZE = 256
+DEFAULT_TTL = 300
+
+# (kind, quiz_id) -> cache entry, least recently used first
+_payloads = OrderedDict()
+_lock = Lock()
+# bumped by every invalidation, so a load that raced one is not stored
+_version = 0
+# pid of the process whose prewarm thread is running; threads do not survive a fork
+_prewarm_pid = None
+
+
+def _build_payload(quiz_id):
+    quiz = db.session.get(Quiz, quiz_id)
+    if quiz is None:
+        return None
+    questions = (
+        db.session.query(Question.id, Question.title, Question.option1, Question.option2,
+                         Question.option3, Question.option4)
+        .filter(Question.chapter_id == quiz.chapter_id)
+        .order_by(Question.id)
+        .all()
+    )
+    # Answers and marks are left out: the payload is what every learner sees
+    return {
+        'id': quiz.id,
+        'quizId': quiz.quizId,
+        'title': quiz.title,
+        'description': quiz.description,
+        'number_of_questions': quiz.number_of_questions,
+        'duration': quiz.duration,
+        'due_date': quiz.due_date,
+        'subject_id': quiz.subject_id,
+        'chapter_id': quiz.chapter_id,
+        'subject': {'id': quiz.subject_id, 'sub_name': quiz.subject.sub_name},
+        'chapter': {'id': quiz.chapter_id, 'chapter_name': quiz.chapter.chapter_name},
+        'questions': [dict(question._mapping) for question in questions],
+    }
+
+
+def _stamp(quiz_id):
+    """The quiz columns cached values depend on and its chapter's questions_version, or None."""
+    row = db.session.execute(
+        select(Quiz.chapter_id, Quiz.subject_id, Quiz.number_of_questions, Quiz.duration, Chapter.questions_version)
+        .join(Chapter, Chapter.id == Quiz.chapter_id)
+        .where(Quiz.id == quiz_id)
+    ).first()
+    return tuple(row) if row is not None else None
+
+
+def cached(kind, quiz_id, build):
+    """Read-through cache shared by everything derived from one quiz.
+
+    ``build(quiz_id)`` returns the value to cache, or None for an unknown quiz.
+    Values must be dicts or objects with ``chapter_id`` and ``subject_id`` so
+    the invalidations below can find them. Every read compares the entry with
+    the quiz row and its chapter's questions_version, which edits in any worker
+    change, so nobody grades with an old answer key. Entries also expire after
+    QUIZ_CACHE_TTL seconds, for the names shown with a quiz.
+    """
+    key = (kind, quiz_id)
+    ttl = current_app.config.get('QUIZ_CACHE_TTL', DEFAULT_TTL)
+    now = time.monotonic()
+    stamp = _stamp(quiz_id)
+    if stamp is None:
+        return None
+    with _lock:
+        entry = _payloads.get(key)
+        if entry is not None and entry['stamp'] == stamp and now - entry['loaded_at'] < ttl:
+            _payloads.move_to_end(key)
+            return entry['value']
+        version = _version
+
+    value = build(quiz_id)
+    if value is None:
+        return None
+
+    with _lock:
+        # Skip storing if an invalidation happened while we were loading
+        if version == _version:
+            _payloads[key] = {
+                'value': value,
+                'quiz_id': quiz_id,
+                'chapter_id': _field(value, 'chapter_id'),
+                'subject_id': _field(value, 'subject_id'),
+                'stamp': stamp,
+                'loaded_at': now,
+            }
+            _payloads.move_to_end(key)
+            while len(_payloads) > current_app.config.get('QUIZ_CACHE_SIZE', DEFAULT_CACHE_SIZE):
+                _payloads.popitem(last=False)
+    return value
+
+
+def _field(value, name):
+    return value[name] if isinstance(value, dict) else getattr(value, name)
+
+
+def get_quiz_payload(quiz_id):
+    """Quiz details and questions (without answers) for the start page."""
+    return cached('payload', quiz_id, _build_payload)
+
+
+def _invalidate(field, value):
+    global _version
+    with _lock:
+        _version += 1
+        for key in [key for key, entry in _payloads.items() if entry[field] == value]:
+            del _payloads[key]
+
+
+def invalidate_quiz(quiz_id):
+    _invalidate('quiz_id', quiz_id)
+
+
+def invalidate_chapter(chapter_id):
+    """Drop the quizzes built on a chapter, e.g. after its questions changed.
+
+    The chapter's questions_version is bumped as well, so the other workers
+    rebuild their copies on their next read. Call it after the change is
+    committed.
+    """
+    with db.engine.begin() as connection:
+        connection.execute(
+            update(Chapter).where(Chapter.id == chapter_id).values(questions_version=Chapter.questions_version + 1)
+        )
+    _invalidate('chapter_id', chapter_id)
+
+
+def invalidate_subject(subject_id):
+    _invalidate('subject_id', subject_id)
+
+
+def prewarm(window=None):
+    """Load the payloads and answer keys of quizzes due within ``window`` into the cache."""
+    from grading import get_answer_key
+    window = window or timedelta(seconds=current_app.config.get('QUIZ_CACHE_PREWARM_WINDOW', 3600))
+    now = datetime.now()
+    quiz_ids = (
+        db.session.query(Quiz.id)
+        .filter(Quiz.is_deleted == False, Quiz.due_date > now, Quiz.due_date <= now + window)
+        .all()
+    )
+    for (quiz_id,) in quiz_ids:
+        get_quiz_payload(quiz_id)
+        get_answer_key(quiz_id)
+    return len(quiz_ids)
+
+
+def _prewarm_loop(app, interval):
+    while True:
+        with app.app_context():
+            try:
+                prewarm()
+            except Exception:
+                db.session.rollback()
+                app.logger.exception('quiz cache prewarm failed')
+            finally:
+                db.session.remove()
+        time.sleep(interval)
+
+
+def start_prewarm():
+    """before_request hook: start this process's prewarm thread if it is not running.
+
+    The thread prewarms every QUIZ_CACHE_PREWARM_INTERVAL seconds, so no
+    request waits for it. It is started on the first request because gunicorn
+    workers forked from a preloaded master do not inherit threads.
+    """
+    global _prewarm_pid
+    if _prewarm_pid == os.getpid():
+        return
+    interval = current_app.config.get('QUIZ_CACHE_PREWARM_INTERVAL', 60)
+    with _lock:
+        if _prewarm_pid == os.getpid():
+            return
+        _prewarm_pid = os.getpid()
+    if interval:
+        Thread(target=_prewarm_loop, args=(current_app._get_current_object(), interval),
+               name='quiz-cache-prewarm', daemon=True).start()
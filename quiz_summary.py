@@ -0,0 +1,73 @@
+from sqlalchemy import select, func
+from models import db, User, Quiz, QuizStats
+
+# columns the admin summary page can be sorted on
+SORT_COLUMNS = ('quiz_Id', 'title', 'attempted', 'not_attempted')
+DEFAULT_PER_PAGE = 25
+MAX_PER_PAGE = 100
+
+
+def get_quiz_summary(sort='quiz_Id', order='asc', page=1, per_page=DEFAULT_PER_PAGE):
+    """Attempted / not attempted counts for one page of quizzes.
+
+    Attempt counts are read from the quiz_stats table maintained at submit
+    time, so the cost of the page does not depend on how many attempts exist.
+    """
+    if sort not in SORT_COLUMNS:
+        sort = 'quiz_Id'
+    if order not in ('asc', 'desc'):
+        order = 'asc'
+    page = max(page or 1, 1)
+    per_page = min(max(per_page or DEFAULT_PER_PAGE, 1), MAX_PER_PAGE)
+
+    # Count non-admin users once, as a scalar subquery of the same statement
+    total_users = (
+        select(func.count(User.id))
+        .where(User.is_admin == False)
+        .scalar_subquery()
+    )
+    attempted = func.coalesce(QuizStats.attempts, 0)
+
+    columns = {
+        'quiz_Id': Quiz.quizId,
+        'title': Quiz.title,
+        'attempted': attempted,
+        'not_attempted': total_users - attempted,
+    }
+    sort_column = columns[sort].desc() if order == 'desc' else columns[sort].asc()
+
+    stmt = (
+        select(
+            Quiz.id,
+            Quiz.quizId,
+            Quiz.title,
+            attempted.label('attempted'),
+            (total_users - attempted).label('not_attempted'),
+        )
+        .outerjoin(QuizStats, QuizStats.quiz_id == Quiz.id)
+        .order_by(sort_column, Quiz.id)
+        .limit(per_page)
+        .offset((page - 1) * per_page)
+    )
+    rows = db.session.execute(stmt).all()
+    total = db.session.execute(select(func.count(Quiz.id))).scalar()
+
+    summary_data = [
+        {
+            'quiz_id': row.id,
+            'quiz_Id': row.quizId,
+            'title': row.title,
+            'attempted': row.attempted,
+            'not_attempted': row.not_attempted,
+        }
+        for row in rows
+    ]
+    return {
+        'items': summary_data,
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'pages': max((total + per_page - 1) // per_page, 1),
+        'sort': sort,
+        'order': order,
+    }
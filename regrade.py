@@ -0,0 +1,159 @@
+from flask import current_app
+from threading import Lock
+from datetime import datetime, timedelta
+import time
+from sqlalchemy import select, update, func, and_, or_, exists, bindparam
+import numpy as np
+from models import db, Question, Quiz, QuizResult, UserAnswer
+from grading import get_answer_key
+from stats import add_results, remove_results
+from quiz_cache import invalidate_chapter
+
+DEFAULT_CHUNK_SIZE = 1000
+# longer than a submission request may take (gunicorn's default worker timeout)
+DEFAULT_RECHECK_DELAY = 30
+
+# regrades run one at a time, so two edits never count the same attempt twice
+_regrade_lock = Lock()
+
+
+def _no_progress(**progress):
+    pass
+
+
+def _row_totals(correct_only):
+    """Correlated subquery summing the marks of an attempt's UserAnswer rows."""
+    condition = and_(
+        UserAnswer.user_id == QuizResult.user_id,
+        UserAnswer.quiz_id == QuizResult.quiz_id,
+        Question.id == UserAnswer.question_id,
+    )
+    if correct_only:
+        condition = and_(condition, UserAnswer.selected_option == Question.correct_option)
+    return (
+        select(func.coalesce(func.sum(Question.marks), 0))
+        .where(condition)
+        .correlate(QuizResult)
+        .scalar_subquery()
+    )
+
+
+def _regrade_rows(ids):
+    """Recompute score and total_marks from UserAnswer with one UPDATE."""
+    db.session.execute(
+        update(QuizResult)
+        .where(QuizResult.id.in_(ids))
+        .values(score=_row_totals(True), total_marks=_row_totals(False)),
+        execution_options={'synchronize_session': False},
+    )
+
+
+def _regrade_packed(attempts):
+    """Recompute packed attempts against the current answer keys, vectorized per attempt."""
+    updates = []
+    for attempt in attempts:
+        key = get_answer_key(attempt.quiz_id)
+        question_ids = np.array(attempt.question_ids.split(','), dtype=np.int64)
+        codes = np.frombuffer(attempt.packed_answers.encode(), dtype=np.uint8).astype(np.int8) - ord('0')
+        positions = np.searchsorted(key.question_ids, question_ids)
+        found = positions < len(key)
+        found[found] = key.question_ids[positions[found]] == question_ids[found]
+        positions, codes = positions[found], codes[found]
+        marks = key.marks[positions]
+        updates.append({
+            'attempt_id': attempt.id,
+            'new_score': int(marks[codes == key.correct[positions]].sum()),
+            'new_total': int(marks.sum()),
+        })
+    if updates:
+        db.session.execute(
+            update(QuizResult.__table__)
+            .where(QuizResult.__table__.c.id == bindparam('attempt_id'))
+            .values(score=bindparam('new_score'), total_marks=bindparam('new_total')),
+            updates,
+        )
+
+
+def _totals(ids, lock=False):
+    stmt = (
+        select(QuizResult.id, QuizResult.user_id, QuizResult.quiz_id, QuizResult.score, QuizResult.total_marks)
+        .where(QuizResult.id.in_(ids))
+    )
+    if lock:
+        # other workers regrading the same attempts wait for this chunk
+        stmt = stmt.with_for_update()
+    return db.session.execute(stmt).all()
+
+
+def regrade_question(question_id, progress=_no_progress, chunk_size=None):
+    """Recompute the attempts that were asked ``question_id``.
+
+    Scores are recomputed from scratch rather than adjusted, so running this
+    twice, or after several edits, gives the same result. Attempts are walked
+    by id in chunks; each chunk is updated, re-counted in the statistics and
+    committed on its own.
+
+    A submission that read the answer key before the edit can commit after
+    the walk passed its id. So once REGRADE_RECHECK_DELAY seconds have gone
+    by, the attempts submitted since that long before the regrade started are
+    recomputed again. Each pass ends by bumping the chapter's
+    questions_version, so every worker rebuilds its leaderboards.
+    """
+    delay = current_app.config.get('REGRADE_RECHECK_DELAY', DEFAULT_RECHECK_DELAY)
+    since = datetime.now() - timedelta(seconds=delay)
+    with _regrade_lock:
+        regraded = _regrade_question(question_id, progress, chunk_size)
+    time.sleep(delay)
+    with _regrade_lock:
+        _regrade_question(question_id, lambda regraded: progress(rechecked=regraded), chunk_size, since)
+    return regraded
+
+
+def _regrade_question(question_id, progress, chunk_size, since=None):
+    chunk_size = chunk_size or current_app.config.get('REGRADE_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    chapter_id = db.session.execute(select(Question.chapter_id).where(Question.id == question_id)).scalar()
+    if chapter_id is None:
+        return 0
+    quiz_ids = db.session.execute(select(Quiz.id).where(Quiz.chapter_id == chapter_id)).scalars().all()
+    if not quiz_ids:
+        return 0
+
+    asked = or_(
+        and_(
+            QuizResult.packed_answers.isnot(None),
+            (',' + QuizResult.question_ids + ',').like(f'%,{int(question_id)},%'),
+        ),
+        exists().where(
+            UserAnswer.user_id == QuizResult.user_id,
+            UserAnswer.quiz_id == QuizResult.quiz_id,
+            UserAnswer.question_id == question_id,
+        ),
+    )
+    if since is not None:
+        asked = and_(asked, QuizResult.quiz_attempt_date >= since)
+    regraded = 0
+    last_id = 0
+    while True:
+        attempts = db.session.execute(
+            select(QuizResult.id, QuizResult.quiz_id, QuizResult.question_ids, QuizResult.packed_answers)
+            .where(QuizResult.quiz_id.in_(quiz_ids), QuizResult.id > last_id, asked)
+            .order_by(QuizResult.id)
+            .limit(chunk_size)
+        ).all()
+        if not attempts:
+            break
+        last_id = attempts[-1].id
+        ids = [attempt.id for attempt in attempts]
+
+        before = _totals(ids, lock=True)
+        _regrade_rows([attempt.id for attempt in attempts if attempt.packed_answers is None])
+        _regrade_packed([attempt for attempt in attempts if attempt.packed_answers is not None])
+        remove_results(before)
+        add_results(_totals(ids))
+        db.session.commit()
+
+        regraded += len(attempts)
+        progress(regraded=regraded)
+
+    invalidate_chapter(chapter_id)
+    return regraded
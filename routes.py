@@ -1,15 +1,45 @@
-from flask import Flask, render_template, request, flash, redirect, url_for, session, Blueprint
-from models import db, User, Subject, Quiz, Question, QuizResult, Chapter, UserAnswer
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, timedelta
+from flask import Flask, render_template, request, flash, redirect, url_for, session, Blueprint, abort, current_app, Response
+from models import db, User, Subject, Quiz, Question, QuizResult, Chapter
+from datetime import datetime
 from functools import wraps
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import os
+from sqlalchemy.orm import joinedload, selectinload
+from quiz_summary import get_quiz_summary, DEFAULT_PER_PAGE
+from identity import get_current_identity, get_current_user, issue_role_claim
+from charts import score_chart_svg
+from pagination import keyset_paginate, page_args
+from search_index import search as search_index, index_object
+from catalog import subject_tree, question_counts, chapter_ids_of
+from quiz_cache import get_quiz_payload, start_prewarm
+from grading import get_answer_key
+from submissions import issue_submission_token, read_submission_token, record_attempt
+from answer_store import load_answers
+from stats import get_user_stats
+from leaderboard import top_results, user_standing
+from item_analysis import get_report as get_item_report, start_report as start_item_report
+from question_selection import select_questions, key_for_ids, questions_of_payload, attempt_questions
+from instrumentation import metrics_allowed, render_metrics
+from pooling import render_pool_metrics
+from passwords import hash_password, verify_password, needs_rehash
+from login_limiter import admit_login
 
 main = Blueprint('main', __name__)
 
+# seconds a client is asked to wait when the password hashing pool is full
+HASHING_BUSY_RETRY = 1
+
+# fill the quiz cache ahead of upcoming due dates, in a thread of each worker
+main.before_app_request(start_prewarm)
+
+def shed(template, status, retry_after, message, **context):
+    """Render ``template`` with a flash message and a Retry-After header instead of doing the work."""
+    flash(message, 'danger')
+    return render_template(template, **context), status, {'Retry-After': str(retry_after)}
+
+
+def hashing_busy(template, **context):
+    return shed(template, 503, HASHING_BUSY_RETRY, 'The server is busy, please try again in a moment', **context)
+
+
 @main.route('/')
 def home():
     return render_template('home.html')
@@ -40,13 +70,16 @@ def register():
             return redirect(url_for('main.register'))
 
         #hashing the password
-        hash_password = generate_password_hash(password)   
+        password_hash = hash_password(password)
+        if password_hash is None:
+            return hashing_busy('register.html')
 
         #create user
-        new_user = User(username=username, password=hash_password, name=name, qualification=qualification, dob=dob)
+        new_user = User(username=username, password=password_hash, name=name, qualification=qualification, dob=dob)
 
      
         db.session.add(new_user)
+        index_object(new_user)
         db.session.commit()
         flash('User created successfully', 'success')
         return redirect(url_for('main.login'))
@@ -64,20 +97,36 @@ def login():
         if not all([username, password]):
             flash('All fields are required', 'danger')
             return redirect(url_for('main.login'))
+
+        # excess attempts are turned away before the user lookup and the hash
+        wait = admit_login(username, request.remote_addr)
+        if wait:
+            return shed('login.html', 429, wait, f'Too many login attempts, please try again in {wait} seconds')
         
         user = User.query.filter_by(username=username).first()
         if not user:
             flash('User does not exist', 'danger')
             return redirect(url_for('main.login'))
         
-        if not check_password_hash(user.password, password):
+        verified = verify_password(user.password, password)
+        if verified is None:
+            return hashing_busy('login.html')
+        if not verified:
             flash('Password is incorrect', 'danger')
             return redirect(url_for('main.login'))
+
+        # hashes made with older parameters are replaced while the password is at hand
+        if needs_rehash(user.password):
+            password_hash = hash_password(password)
+            if password_hash is not None:
+                user.password = password_hash
+                db.session.commit()
         
         session['id'] = user.id
         session['user'] = user.username
         session['name'] = user.name
         session['is_admin'] = user.is_admin
+        issue_role_claim(user)
 
         if user.is_admin:
             flash('Admin login successfully', 'success')
@@ -95,8 +144,8 @@ def user_required(func):
         if "id" not in session:
             flash('Please login to continue', 'info')
             return redirect(url_for('main.login'))
-        
-        user = User.query.get(session['id'])
+
+        user = get_current_identity()
         if not user:  
             flash('User not found, please login again', 'danger')
             return redirect(url_for('main.login'))
@@ -118,7 +167,7 @@ def admin_required(func):
             flash('Please login to continue', 'danger')
             return redirect(url_for('main.login'))
 
-        user = User.query.get(session['id'])
+        user = get_current_identity()
         if not user:  
             flash('User not found, please login again', 'danger')
             return redirect(url_for('main.login'))
@@ -143,42 +192,48 @@ def logout():
 @admin_required
 def admin_dashboard():
     user = session.get('name', 'User')
-    subjects = Subject.query.all()
-    return render_template("admin_side/admin_dashboard.html", user=user, subjects=subjects)
+    page = keyset_paginate(subject_tree(), Subject.id, **page_args(request))
+    counts = question_counts(chapter_ids_of(page['items']))
+    return render_template("admin_side/admin_dashboard.html", user=user, subjects=page['items'], page=page,
+                           question_counts=counts)
 
 #Admin side view Quizzes
 @main.route('/admin/view_quizzes')
 @admin_required
 def view_quizzes():
-    quizzes = Quiz.query.all()
-    return render_template("admin_side/view_quizzes.html", quizzes=quizzes)
+    page = keyset_paginate(Quiz.query, Quiz.id, **page_args(request))
+    return render_template("admin_side/view_quizzes.html", quizzes=page['items'], page=page)
 
 #Admin side summary
 @main.route('/admin/summary')
 @admin_required
 def summary():
-    quizzes = Quiz.query.all()
+    summary_page = get_quiz_summary(
+        sort=request.args.get('sort', 'quiz_Id'),
+        order=request.args.get('order', 'asc'),
+        page=request.args.get('page', 1, type=int),
+        per_page=request.args.get('per_page', DEFAULT_PER_PAGE, type=int),
+    )
 
-    summary_data = []
-    for quiz in quizzes:
-        total_users = User.query.filter_by(is_admin=False).count()  # Count non-admin users only
-        attempted_users = (
-            QuizResult.query
-            .join(User)
-            .filter(QuizResult.quiz_id == quiz.id, User.is_admin == False)
-            .count()
-        )
-        not_attempted_users = total_users - attempted_users
-
-        summary_data.append({
-            'quiz_id': quiz.id,
-            'quiz_Id': quiz.quizId,
-            'title': quiz.title,
-            'attempted': attempted_users,
-            'not_attempted': not_attempted_users
-        })
-
-    return render_template("admin_side/summary.html", summary_data=summary_data)
+    return render_template("admin_side/summary.html", summary_data=summary_page['items'], summary=summary_page)
+
+#Admin side item analysis
+@main.route('/admin/quiz/<int:quiz_id>/item_analysis')
+@admin_required
+def item_analysis(quiz_id):
+    quiz = Quiz.query.get_or_404(quiz_id)
+    # Reports are computed by a background job and cached until new submissions
+    report = get_item_report(quiz_id)
+    if report is None:
+        job_id = start_item_report(quiz_id)
+        return render_template("admin_side/item_analysis.html", quiz=quiz, report=None, job_id=job_id)
+
+    titles = dict(
+        db.session.query(Question.id, Question.title)
+        .filter(Question.id.in_([item['question_id'] for item in report['questions']]))
+        .all()
+    )
+    return render_template("admin_side/item_analysis.html", quiz=quiz, report=report, titles=titles)
 
 #admin seach route
 @main.route('/admin/search')
@@ -228,6 +283,27 @@ def user_score():
     )
     return render_template("user_side/user_score.html", attempts=attempts)
 
+#User side leaderboard route
+@main.route('/quiz/<int:quiz_id>/leaderboard')
+@user_required
+def quiz_leaderboard(quiz_id):
+    quiz = Quiz.query.get_or_404(quiz_id)
+    user_id = session.get('id')
+
+    # Ranks come from the in-memory leaderboard, only the names are queried; the standing goes first
+    # because it rebuilds a board that misses the user's result
+    standing = user_standing(quiz_id, user_id)
+    top = top_results(quiz_id)
+    names = dict(
+        db.session.query(User.id, User.name).filter(User.id.in_([uid for uid, _ in top])).all()
+    ) if top else {}
+    leaders = []
+    for position, (uid, percent) in enumerate(top, start=1):
+        # equal scores share a rank, as in user_standing
+        rank = leaders[-1]['rank'] if leaders and leaders[-1]['percent'] == percent else position
+        leaders.append({'rank': rank, 'name': names.get(uid, '-'), 'percent': percent, 'is_me': uid == user_id})
+    return render_template('user_side/leaderboard.html', quiz=quiz, leaders=leaders, standing=standing)
+
 #User side summary route
 @main.route('/user/summary')
 @user_required
@@ -256,34 +332,19 @@ def user_summary():
     quiz_names = [quiz.title for _, quiz in attempts]
     scores_percent = [(attempt.score / attempt.total_marks) * 100 for attempt, _ in attempts]
 
-    # Calculate overall average percentage
-    avg_score = round(sum(scores_percent) / len(scores_percent), 2)
-
-    # Plot the graph
-    plt.figure(figsize=(10, 5))
-    plt.bar(quiz_names, scores_percent, color='skyblue')
-    plt.xlabel("Quizzes")
-    plt.ylabel("Scores (%)")
-    plt.title("Quiz Scores")
-    plt.xticks(rotation=45)
-    plt.tight_layout()
+    # Overall average percentage, kept up to date at submit time
+    avg_score = round(get_user_stats(user_id)['average_percent'] or 0, 2)
 
-    # Save the plot in static folder
-    graph_dir = "static/graph"
-    os.makedirs(graph_dir, exist_ok=True)
+    # Chart is served from the in-memory cache when the attempts have not changed
+    chart_svg = score_chart_svg(quiz_names, scores_percent)
 
-    graph_filename = f"user_graph_{user_id}.png"
-    graph_path = os.path.join(graph_dir, graph_filename)
-    plt.savefig(graph_path)
-    plt.close()
-
-    return render_template('user_side/user_summary.html', avg_score=avg_score, graph_url=url_for('static', filename=f'graph/{graph_filename}'))
+    return render_template('user_side/user_summary.html', avg_score=avg_score, chart_svg=chart_svg)
 
 #user profile update route
 @main.route('/user/profile', methods=['GET', 'POST'])
 @user_required
 def user_profile():
-    user = User.query.get(session['id'])
+    user = get_current_user()
     if request.method == 'POST':
         cpassword = request.form.get('cpassword')
         name = request.form.get('name')
@@ -294,7 +355,10 @@ def user_profile():
             flash('Please fill all the fields', 'danger')
             return redirect(url_for('main.user_profile'))
         
-        if not check_password_hash(user.password, cpassword):
+        verified = verify_password(user.password, cpassword)
+        if verified is None:
+            return hashing_busy('user_side/user_profile.html', user=user)
+        if not verified:
             flash('Incorrect Current Password', 'danger')
             return redirect(url_for('main.user_profile'))
         
@@ -306,6 +370,7 @@ def user_profile():
         user.name = name
         user.dob = dob
         user.qualification = qualification
+        index_object(user)
         db.session.commit()
         flash('Profile updated successfully', 'success')
         return redirect(url_for('main.user_profile'))
@@ -316,79 +381,66 @@ def user_profile():
 @main.route('/quiz/start/<int:quiz_id>')
 @user_required
 def start_quiz(quiz_id):
-    quiz = Quiz.query.get(quiz_id)
+    # Same payload for every learner, served from the quiz cache
+    quiz = get_quiz_payload(quiz_id)
+    if quiz is None:
+        abort(404)
     user_id = session.get('id')
-    questions = Question.query.filter_by(chapter_id=quiz.chapter_id)
 
     # Check if the user has already attempted the quiz
     attempt = QuizResult.query.filter_by(user_id=user_id, quiz_id=quiz_id).first()
     if attempt:
         flash("You have already attempted this quiz.", "danger")
         return redirect(url_for('main.user_dashboard'))
-    return render_template("user_side/start_quiz.html", quiz=quiz, questions=questions)
+
+    # This learner's sample of the question bank, picked from the cached answer key
+    selection = select_questions(get_answer_key(quiz_id), user_id)
+    question_ids = selection.question_ids.tolist()
+    questions = questions_of_payload(quiz, question_ids)
+    # the shown questions travel in the token, so later edits to the bank cannot change them
+    submission_token = issue_submission_token(user_id, quiz_id, question_ids)
+    return render_template("user_side/start_quiz.html", quiz=quiz, questions=questions,
+                           submission_token=submission_token)
 
 # submit quiz route
-@main.route('/submit/quiz/<quiz_id>', methods=['POST'])
+@main.route('/submit/quiz/<int:quiz_id>', methods=['POST'])
 @user_required
 def submit_quiz(quiz_id):
-    quiz = Quiz.query.get_or_404(quiz_id)
+    # Cached answer key: question ids, correct options and marks as arrays
+    key = get_answer_key(quiz_id)
+    if key is None:
+        abort(404)
     user_id = session.get('id')
 
     if not user_id:
         flash("You must be logged in to submit the quiz.", "danger")
         return redirect(url_for('main.login'))
 
-    # Check if the user has already submitted this quiz
-    existing_attempt = QuizResult.query.filter_by(user_id=user_id, quiz_id=quiz_id).first()
-    if existing_attempt:
-        flash("You have already submitted this quiz.", "warning")
+    # The token ties the submission to one rendering of the start page
+    quiz = get_quiz_payload(quiz_id)
+    token = read_submission_token(request.form.get('submission_token'), user_id, quiz_id, quiz['duration'])
+    if token is None:
+        flash("Your quiz session is invalid or has expired, please start the quiz again.", "danger")
         return redirect(url_for('main.user_dashboard'))
+    nonce, shown = token
 
-    # Fetch questions and calculate total marks
-    questions = Question.query.filter_by(chapter_id=quiz.chapter_id).all()
-    total_marks = sum(q.marks for q in questions)
-
-    # Create a new attempt entry
-    attempt = QuizResult(
-        user_id=user_id,
-        quiz_id=quiz.id,
-        score=0,
-        total_marks=total_marks,
-        total_questions=len(questions)
-    )
-    db.session.add(attempt)
-    db.session.flush()  # Flush to get attempt ID without committing fully
+    # Grade exactly the questions this learner was shown, against the current answers and marks
+    key = select_questions(key, user_id) if shown is None else key_for_ids(key, shown)
+    if key is None:
+        flash("A question of this quiz was removed while you were taking it, please start the quiz again.", "danger")
+        return redirect(url_for('main.user_dashboard'))
 
-    score = 0
-    user_answers = []  # Collect all answers first
+    # Score the whole submission in one vectorized comparison and store it at most once
+    selected = key.selected_from_form(request.form)
+    attempt, created = record_attempt(user_id, key, selected, nonce)
+    if not created and attempt.submission_token != nonce:
+        flash("You have already submitted this quiz.", "warning")
+        return redirect(url_for('main.user_dashboard'))
 
-    # Process each question's answer
-    for question in questions:
-        user_answer = request.form.get(f'question_{question.id}')
-        
-        # Ensure the answer is saved even if it's wrong or missing
-        user_answers.append(
-            UserAnswer(
-                user_id=user_id,
-                quiz_id=quiz.id,
-                question_id=question.id,
-                selected_option=user_answer if user_answer else "Not Answered"
-            )
-        )
-
-        # Score calculation (only if answer is correct)
-        if user_answer and str(user_answer) == str(question.correct_option):
-            score += question.marks
-
-    # Bulk insert all answers at once (better performance)
-    db.session.bulk_save_objects(user_answers)
-
-    # Update attempt with final score
-    attempt.score = score
-    db.session.commit()
-
-    # Calculate percentage and show results
-    percentage_score = (score / total_marks) * 100
+    # A retried submission (double click, auto-submit) gets the original result
+    score = attempt.score
+    total_marks = attempt.total_marks
+    percentage_score = (score / total_marks) * 100 if total_marks else 0
     flash(f"Quiz submitted successfully! You scored {score} out of {total_marks} ({percentage_score:.2f}%)", "success")
     return redirect(url_for('main.user_dashboard'))
 
@@ -398,7 +450,6 @@ def submit_quiz(quiz_id):
 def view_attempted_quiz(quiz_id):
     user_id = session.get('id')
     quiz = Quiz.query.get_or_404(quiz_id)
-    questions = Question.query.filter_by(chapter_id=quiz.chapter_id).all()
 
     # Fetch the user's attempt for this quiz
     attempt = QuizResult.query.filter_by(user_id=user_id, quiz_id=quiz_id).first()
@@ -406,11 +457,11 @@ def view_attempted_quiz(quiz_id):
         flash("You have not attempted this quiz yet.", "danger")
         return redirect(url_for('main.user_dashboard'))
 
-    # Fetch user's answers for this quiz
-    user_answers = UserAnswer.query.filter_by(user_id=user_id, quiz_id=quiz_id).all()
+    # Only the questions this attempt was asked
+    questions = attempt_questions(attempt, quiz.chapter_id)
 
-    # Create a dictionary to map question_id to selected_option
-    answers_dict = {answer.question_id: answer.selected_option for answer in user_answers}
+    # question_id -> selected_option, from the packed columns or UserAnswer rows
+    answers_dict = load_answers(attempt)
 
     # Add selected_option to each question object
     for question in questions:
@@ -444,7 +495,10 @@ def forget_password():
             flash('Date of birth is incorrect', 'danger')
             return redirect(url_for('main.forget_password'))
 
-        user.password = generate_password_hash(password)
+        password_hash = hash_password(password)
+        if password_hash is None:
+            return hashing_busy('forget_password.html')
+        user.password = password_hash
         db.session.commit()
         flash('Password updated successfully', 'success')
         return redirect(url_for('main.login'))
@@ -459,23 +513,28 @@ def admin_search_result():
     results = {}
 
     if query:
-        search_query = f"%{query}%"
-
         # Fetch users (both admin and non-admin)
-        users = User.query.filter(User.username.ilike(search_query) | User.name.ilike(search_query)).all()
+        users = search_index('user', query)
 
-        # Fetch quiz attempts **only for non-admin users**
-        user_attempts = {
-            user.id: QuizResult.query.filter_by(user_id=user.id).all()
-            for user in users if not user.is_admin
-        }
+        # Fetch quiz attempts **only for non-admin users**, in one query with their quizzes
+        learner_ids = [user.id for user in users if not user.is_admin]
+        attempts = (
+            QuizResult.query
+            .options(joinedload(QuizResult.quiz))
+            .filter(QuizResult.user_id.in_(learner_ids))
+            .order_by(QuizResult.user_id, QuizResult.quiz_attempt_date)
+            .all()
+        ) if learner_ids else []
+        user_attempts = {}
+        for attempt in attempts:
+            user_attempts.setdefault(attempt.user_id, []).append(attempt)
 
         results = {
             "users": users,
             "user_attempts": user_attempts,
-            "subjects": Subject.query.filter(Subject.sub_name.ilike(search_query) | Subject.subjectId.ilike(search_query)).all(),
-            "chapters": Chapter.query.filter(Chapter.chapter_name.ilike(search_query) | Chapter.chapterId.ilike(search_query)).all(),
-            "quizzes": Quiz.query.filter(Quiz.title.ilike(search_query) | Quiz.quizId.ilike(search_query)).all(),
+            "subjects": search_index('subject', query, options=[selectinload(Subject.chapters)]),
+            "chapters": search_index('chapter', query, options=[joinedload(Chapter.subject)]),
+            "quizzes": search_index('quiz', query),
         }
     return render_template("admin_side/search_result.html", results=results, search_query=query)
 
@@ -490,30 +549,9 @@ def user_search_result():
     now = datetime.now()
 
     if search:
-        # Search quizzes by title
-        quizzes = Quiz.query.filter(Quiz.title.ilike(f"%{search}%")).all()
-
-        # Search subjects and fetch quizzes related to those subjects
-        subjects = Subject.query.filter(Subject.sub_name.ilike(f"%{search}%")).all()
-        subject_quizzes = (
-            Quiz.query.join(Subject)
-            .filter(Subject.sub_name.ilike(f"%{search}%"))
-            .all()
-        )
-
-        # Search chapters and fetch quizzes related to those chapters
-        chapters = Chapter.query.filter(Chapter.chapter_name.ilike(f"%{search}%")).all()
-        chapter_quizzes = (
-            Quiz.query.join(Chapter)
-            .filter(Chapter.chapter_name.ilike(f"%{search}%"))
-            .all()
-        )
-
-        # Combine all unique quizzes
-        all_quizzes = list(set(quizzes + subject_quizzes + chapter_quizzes))
-
+        # Quizzes matching by title, subject name or chapter name, ranked
         results = {
-            "quizzes": all_quizzes
+            "quizzes": search_index('quiz_topic', search)
         }
 
     # Get the list of quiz IDs the user has attempted
@@ -544,28 +582,31 @@ def attempted_users(quiz_id):
 def not_attempted_users(quiz_id):
     quiz = Quiz.query.get_or_404(quiz_id)
 
-    # Fetch all users
-    all_users = User.query.filter(User.is_admin == False).all()
-
-    # Fetch users who attempted the quiz
-    attempted_users_ids = (
-        db.session.query(QuizResult.user_id)
-        .filter(QuizResult.quiz_id == quiz_id)
-        .all()
+    # Non-admin users without a result for this quiz (anti-join in SQL)
+    attempted = (
+        db.session.query(QuizResult.id)
+        .filter(QuizResult.user_id == User.id, QuizResult.quiz_id == quiz_id)
+        .exists()
     )
-    attempted_users_ids = {user_id[0] for user_id in attempted_users_ids}
-
-    # Get users who didn't attempt the quiz
-    not_attempted = [user for user in all_users if user.id not in attempted_users_ids]
+    not_attempted = User.query.filter(User.is_admin == False, ~attempted)
+    page = keyset_paginate(not_attempted, User.id, **page_args(request))
 
     return render_template(
-        'admin_side/not_attempted_users.html', quiz=quiz, users=not_attempted)
+        'admin_side/not_attempted_users.html', quiz=quiz, users=page['items'], page=page)
 
 # Route to view all users
 @main.route('/admin/user/list')
 @admin_required
 def user_list():
-    users = User.query.filter(User.is_admin == False).all()
-    return render_template('admin_side/user_list.html', users=users)
-
-# summary
\ No newline at end of file
+    users = User.query.filter(User.is_admin == False)
+    page = keyset_paginate(users, User.id, **page_args(request))
+    return render_template('admin_side/user_list.html', users=page['items'], page=page)
+
+# summary
+
+# per-endpoint request totals and connection pool state for Prometheus
+@main.route('/metrics')
+def metrics():
+    if not metrics_allowed(request.remote_addr, current_app.config.get('METRICS_ALLOW_REMOTE', False)):
+        abort(404)
+    return Response(render_metrics() + render_pool_metrics(), mimetype='text/plain; version=0.0.4')
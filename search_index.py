@@ -0,0 +1,218 @@
+from flask import current_app
+from sqlalchemy import select, delete, func, inspect, text, Integer, Float
+from models import db, User, Subject, Chapter, Quiz, SearchDocument
+
+# entity name -> model the search results are loaded from
+ENTITIES = {
+    'user': User,
+    'subject': Subject,
+    'chapter': Chapter,
+    'quiz': Quiz,
+    # quizzes found by title, subject name or chapter name (user side search)
+    'quiz_topic': Quiz,
+}
+
+DEFAULT_RESULT_LIMIT = 50
+
+SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_document_fts USING fts5("
+    "content, content='search_document', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS search_document_ai AFTER INSERT ON search_document BEGIN "
+    "INSERT INTO search_document_fts(rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS search_document_ad AFTER DELETE ON search_document BEGIN "
+    "INSERT INTO search_document_fts(search_document_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS search_document_au AFTER UPDATE ON search_document BEGIN "
+    "INSERT INTO search_document_fts(search_document_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+    "INSERT INTO search_document_fts(rowid, content) VALUES (new.id, new.content); END",
+]
+
+POSTGRES_TRGM_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_search_document_content_trgm "
+    "ON search_document USING gin (content gin_trgm_ops)",
+]
+
+
+def _like_pattern(query):
+    escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+class LikeBackend:
+    """Substring match on the search_document table; works on any database."""
+    name = 'like'
+
+    def hits(self, entity, query):
+        return select(
+            SearchDocument.entity_id.label('entity_id'),
+            func.length(SearchDocument.content).label('rank'),
+        ).where(
+            SearchDocument.entity == entity,
+            SearchDocument.content.ilike(_like_pattern(query), escape='\\'),
+        )
+
+
+class SqliteFtsBackend(LikeBackend):
+    """FTS5 trigram index, the local stand-in for the Postgres backend."""
+    name = 'sqlite_fts5'
+
+    def hits(self, entity, query):
+        # trigrams need at least three characters
+        if len(query) < 3:
+            return super().hits(entity, query)
+        return text(
+            "SELECT d.entity_id AS entity_id, search_document_fts.rank AS rank "
+            "FROM search_document_fts JOIN search_document AS d ON d.id = search_document_fts.rowid "
+            "WHERE search_document_fts MATCH :match AND d.entity = :entity"
+        ).bindparams(
+            match='"' + query.replace('"', '""') + '"',
+            entity=entity,
+        ).columns(entity_id=Integer, rank=Float)
+
+
+class PostgresTrigramBackend(LikeBackend):
+    """ILIKE served by a pg_trgm GIN index, ranked by word similarity."""
+    name = 'postgres_trgm'
+
+    def hits(self, entity, query):
+        return select(
+            SearchDocument.entity_id.label('entity_id'),
+            (-func.word_similarity(query, SearchDocument.content)).label('rank'),
+        ).where(
+            SearchDocument.entity == entity,
+            SearchDocument.content.ilike(_like_pattern(query), escape='\\'),
+        )
+
+
+_backends = {}
+
+
+def get_backend():
+    """Pick the best backend the configured database supports."""
+    configured = current_app.config.get('SEARCH_BACKEND', 'auto')
+    key = (str(db.engine.url), configured)
+    if key in _backends:
+        return _backends[key]
+
+    backend = LikeBackend()
+    if configured == 'auto':
+        dialect = db.engine.dialect.name
+        if dialect == 'sqlite' and inspect(db.engine).has_table('search_document_fts'):
+            backend = SqliteFtsBackend()
+        elif dialect == 'postgresql':
+            with db.engine.connect() as connection:
+                has_trgm = connection.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first()
+            if has_trgm:
+                backend = PostgresTrigramBackend()
+    _backends[key] = backend
+    return backend
+
+
+class Results(list):
+    """Matches of a search; ``truncated`` when more matched than the limit."""
+    truncated = False
+
+
+def search(entity, query, limit=None, options=()):
+    """Ranked, de-duplicated matches for ``query`` with one statement per entity.
+
+    At most SEARCH_RESULT_LIMIT matches are returned, best first; the pages
+    say so when there were more. ``options`` are loader options applied to the
+    result query, e.g. eager loads for relationships the caller renders.
+    """
+    model = ENTITIES[entity]
+    limit = limit or current_app.config.get('SEARCH_RESULT_LIMIT', DEFAULT_RESULT_LIMIT)
+    hits = get_backend().hits(entity, query).subquery('hits')
+    # one row more than shown tells whether anything was cut off
+    results = Results(
+        model.query
+        .options(*options)
+        .join(hits, hits.c.entity_id == model.id)
+        .order_by(hits.c.rank, model.id)
+        .limit(limit + 1)
+        .all()
+    )
+    if len(results) > limit:
+        del results[limit:]
+        results.truncated = True
+    return results
+
+
+def _documents(obj):
+    if isinstance(obj, User):
+        yield 'user', f'{obj.username} {obj.name}'
+    elif isinstance(obj, Subject):
+        yield 'subject', f'{obj.subjectId} {obj.sub_name}'
+    elif isinstance(obj, Chapter):
+        yield 'chapter', f'{obj.chapterId} {obj.chapter_name}'
+    elif isinstance(obj, Quiz):
+        yield 'quiz', f'{obj.quizId} {obj.title}'
+        yield 'quiz_topic', f'{obj.title} {obj.subject.sub_name} {obj.chapter.chapter_name}'
+
+
+def index_object(obj):
+    """Add or refresh the search documents of ``obj`` in the current transaction."""
+    if obj.id is None:
+        db.session.flush()
+    if isinstance(obj, Quiz):
+        # a moved quiz still has its old subject and chapter loaded; reload them from the new ids
+        db.session.flush()
+        db.session.expire(obj, ['subject', 'chapter'])
+    for entity, content in _documents(obj):
+        document = SearchDocument.query.filter_by(entity=entity, entity_id=obj.id).first()
+        if document is None:
+            db.session.add(SearchDocument(entity=entity, entity_id=obj.id, content=content))
+        elif document.content != content:
+            document.content = content
+
+    # quizzes are also found by their subject and chapter names
+    if isinstance(obj, Subject):
+        for quiz in Quiz.query.filter_by(subject_id=obj.id):
+            index_object(quiz)
+    elif isinstance(obj, Chapter):
+        for quiz in Quiz.query.filter_by(chapter_id=obj.id):
+            index_object(quiz)
+
+
+def remove_documents(entities, ids):
+    """Drop documents; ``ids`` may be a list or a subquery of ids."""
+    db.session.execute(
+        delete(SearchDocument).where(SearchDocument.entity.in_(entities), SearchDocument.entity_id.in_(ids)),
+        execution_options={'synchronize_session': False},
+    )
+
+
+def create_search_structures():
+    """Create the dialect specific index structures if they are missing.
+
+    A new FTS5 table starts empty while search_document may already have rows
+    (db.create_all() databases index as they go), so it is filled from them;
+    otherwise the delete triggers would remove entries it never held and
+    corrupt the index.
+    """
+    dialect = db.engine.dialect.name
+    ddl = {'sqlite': SQLITE_FTS_DDL, 'postgresql': POSTGRES_TRGM_DDL}.get(dialect, [])
+    with db.engine.begin() as connection:
+        new_fts = dialect == 'sqlite' and not inspect(connection).has_table('search_document_fts')
+        for statement in ddl:
+            connection.execute(text(statement))
+        if new_fts:
+            connection.execute(text("INSERT INTO search_document_fts(search_document_fts) VALUES ('rebuild')"))
+    _backends.clear()
+
+
+def rebuild_index(batch_size=1000):
+    """Recreate every search document from the source tables."""
+    create_search_structures()
+    db.session.execute(delete(SearchDocument))
+    count = 0
+    for model in (User, Subject, Chapter, Quiz):
+        for obj in db.session.execute(select(model).execution_options(yield_per=batch_size)).scalars():
+            for entity, content in _documents(obj):
+                db.session.add(SearchDocument(entity=entity, entity_id=obj.id, content=content))
+                count += 1
+                # flushed rows are only weakly referenced, so memory stays flat
+                if count % batch_size == 0:
+                    db.session.flush()
+    db.session.commit()
+    return count
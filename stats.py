@@ -0,0 +1,159 @@
+from sqlalchemy import select, insert, update, delete, func, case, literal, and_, or_
+from sqlalchemy.exc import IntegrityError
+import math
+from models import db, QuizResult, QuizStats, UserStats
+
+HISTOGRAM_BUCKETS = 10
+
+
+def bucket_of(score, total_marks):
+    """Histogram bucket of a result: tenths of the percentage, 100% in the last one."""
+    if not total_marks:
+        return 0
+    return min(score * HISTOGRAM_BUCKETS // total_marks, HISTOGRAM_BUCKETS - 1)
+
+
+def _percent(score, total_marks):
+    return score * 100 / total_marks if total_marks else 0.0
+
+
+def _deltas(results, sign):
+    """Per quiz and per user column increments for ``results``."""
+    quizzes, users = {}, {}
+    for result in results:
+        quiz = quizzes.setdefault(result.quiz_id, {})
+        user = users.setdefault(result.user_id, {})
+        percent = _percent(result.score, result.total_marks)
+        for totals in (quiz, user):
+            totals['attempts'] = totals.get('attempts', 0) + sign
+            totals['score_sum'] = totals.get('score_sum', 0) + sign * result.score
+            totals['percent_sum'] = totals.get('percent_sum', 0.0) + sign * percent
+        quiz['score_sq_sum'] = quiz.get('score_sq_sum', 0) + sign * result.score * result.score
+        bucket = f'hist_{bucket_of(result.score, result.total_marks)}'
+        quiz[bucket] = quiz.get(bucket, 0) + sign
+    return quizzes, users
+
+
+def _increment(model, key_column, key, totals, create):
+    """UPDATE ... SET col = col + delta, creating the row first if it is missing."""
+    stmt = (
+        update(model)
+        .where(key_column == key)
+        .values({name: getattr(model, name) + delta for name, delta in totals.items()})
+        .execution_options(synchronize_session=False)
+    )
+    if db.session.execute(stmt).rowcount or not create:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(model).values({key_column.key: key, **totals}))
+    except IntegrityError:
+        # created by a concurrent submission in the meantime
+        db.session.execute(stmt)
+
+
+def _apply(results, sign):
+    quizzes, users = _deltas(results, sign)
+    for quiz_id, totals in quizzes.items():
+        _increment(QuizStats, QuizStats.quiz_id, quiz_id, totals, sign > 0)
+    for user_id, totals in users.items():
+        _increment(UserStats, UserStats.user_id, user_id, totals, sign > 0)
+
+
+def add_results(results):
+    """Count new results in the current transaction.
+
+    ``results`` are objects or rows with user_id, quiz_id, score and total_marks.
+    """
+    _apply(results, 1)
+
+
+def remove_results(results):
+    """Uncount results that are being deleted in the current transaction."""
+    _apply(results, -1)
+
+
+def drop_quiz_stats(quiz_id):
+    db.session.execute(delete(QuizStats).where(QuizStats.quiz_id == quiz_id))
+
+
+def drop_user_stats(user_id):
+    db.session.execute(delete(UserStats).where(UserStats.user_id == user_id))
+
+
+def get_quiz_stats(quiz_id):
+    """Attempts, mean and spread of the scores and the percentage histogram of a quiz."""
+    stats = db.session.get(QuizStats, quiz_id)
+    if stats is None or not stats.attempts:
+        return {'attempts': 0, 'mean_score': None, 'stddev_score': None,
+                'mean_percent': None, 'histogram': [0] * HISTOGRAM_BUCKETS}
+    mean = stats.score_sum / stats.attempts
+    variance = max(stats.score_sq_sum / stats.attempts - mean * mean, 0.0)
+    return {
+        'attempts': stats.attempts,
+        'mean_score': mean,
+        'stddev_score': math.sqrt(variance),
+        'mean_percent': stats.percent_sum / stats.attempts,
+        'histogram': [getattr(stats, f'hist_{bucket}') for bucket in range(HISTOGRAM_BUCKETS)],
+    }
+
+
+def get_user_stats(user_id):
+    """Attempts and average percentage of a user."""
+    stats = db.session.get(UserStats, user_id)
+    if stats is None or not stats.attempts:
+        return {'attempts': 0, 'average_percent': None}
+    return {'attempts': stats.attempts, 'average_percent': stats.percent_sum / stats.attempts}
+
+
+def _percent_column():
+    return case(
+        (QuizResult.total_marks > 0, QuizResult.score * 100.0 / QuizResult.total_marks),
+        else_=literal(0.0),
+    )
+
+
+def _bucket_count(bucket):
+    # integer comparisons only, so every database agrees with bucket_of()
+    scaled = QuizResult.score * HISTOGRAM_BUCKETS
+    marks = QuizResult.total_marks
+    if bucket == 0:
+        # results without marks count as 0%
+        condition = or_(marks <= 0, scaled < marks)
+    elif bucket == HISTOGRAM_BUCKETS - 1:
+        condition = and_(marks > 0, scaled >= bucket * marks)
+    else:
+        condition = and_(marks > 0, scaled >= bucket * marks, scaled < (bucket + 1) * marks)
+    return func.sum(case((condition, 1), else_=0))
+
+
+def rebuild_stats():
+    """Recompute both tables from QuizResult with two INSERT ... SELECT statements."""
+    db.session.execute(delete(QuizStats))
+    db.session.execute(delete(UserStats))
+    hist_columns = [f'hist_{bucket}' for bucket in range(HISTOGRAM_BUCKETS)]
+    db.session.execute(insert(QuizStats).from_select(
+        ['quiz_id', 'attempts', 'score_sum', 'score_sq_sum', 'percent_sum', *hist_columns],
+        select(
+            QuizResult.quiz_id,
+            func.count(QuizResult.id),
+            func.sum(QuizResult.score),
+            func.sum(QuizResult.score * QuizResult.score),
+            func.sum(_percent_column()),
+            *[_bucket_count(bucket) for bucket in range(HISTOGRAM_BUCKETS)],
+        ).group_by(QuizResult.quiz_id),
+    ))
+    db.session.execute(insert(UserStats).from_select(
+        ['user_id', 'attempts', 'score_sum', 'percent_sum'],
+        select(
+            QuizResult.user_id,
+            func.count(QuizResult.id),
+            func.sum(QuizResult.score),
+            func.sum(_percent_column()),
+        ).group_by(QuizResult.user_id),
+    ))
+    db.session.commit()
+    return (
+        db.session.execute(select(func.count()).select_from(QuizStats)).scalar(),
+        db.session.execute(select(func.count()).select_from(UserStats)).scalar(),
+    )
@@ -0,0 +1,100 @@
+from flask import current_app
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+from uuid import uuid4
+from models import db, QuizResult
+from grading import insert_answers
+from answer_store import pack, packed_storage_enabled
+from stats import add_results
+from leaderboard import record_result
+
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt='quiz-submission')
+
+
+def issue_submission_token(user_id, quiz_id, question_ids):
+    """Signed token for one rendering of a quiz's start page and the questions it showed."""
+    return _serializer().dumps({'u': user_id, 'q': quiz_id, 'n': uuid4().hex, 'i': list(question_ids)})
+
+
+def read_submission_token(token, user_id, quiz_id, duration_minutes):
+    """(nonce, question ids shown) of a valid token for this user and quiz, or None.
+
+    The question ids are None for tokens issued before they were included.
+
+    Tokens stay valid for the quiz duration plus SUBMISSION_TOKEN_GRACE seconds,
+    which covers the auto-submit at the end of the timer.
+    """
+    max_age = duration_minutes * 60 + current_app.config.get('SUBMISSION_TOKEN_GRACE', 300)
+    try:
+        data = _serializer().loads(token or '', max_age=max_age)
+    except BadSignature:
+        return None
+    if data.get('u') != user_id or data.get('q') != quiz_id:
+        return None
+    return data.get('n'), data.get('i')
+
+
+def _insert_attempt(values):
+    """INSERT the attempt unless (user_id, quiz_id) exists; returns the new id or None.
+
+    Relies on the uq_quiz_result_user_quiz constraint rather than a lock, so
+    concurrent submits of the same attempt cannot both succeed.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        dialect_insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = (
+            dialect_insert(QuizResult)
+            .values(**values)
+            .on_conflict_do_nothing(index_elements=['user_id', 'quiz_id'])
+            .returning(QuizResult.id)
+        )
+        return db.session.execute(stmt).scalar()
+
+    # Other databases: let the unique constraint reject the duplicate
+    try:
+        with db.session.begin_nested():
+            return db.session.execute(insert(QuizResult).values(**values)).inserted_primary_key[0]
+    except IntegrityError:
+        return None
+
+
+def record_attempt(user_id, key, selected, nonce):
+    """Store a graded submission at most once per user and quiz.
+
+    Returns ``(attempt, created)``. When the attempt already exists ``created``
+    is False and nothing is written; comparing ``attempt.submission_token`` with
+    ``nonce`` tells a retried submission apart from a second one.
+    """
+    values = {
+        'user_id': user_id,
+        'quiz_id': key.quiz_id,
+        'score': key.score(selected),
+        'total_marks': key.total_marks,
+        'total_questions': len(key),
+        'quiz_attempt_date': datetime.now(),
+        'submission_token': nonce,
+    }
+    # The questions asked are kept either way; the answers only when packed
+    values['question_ids'], packed_answers = pack(key.question_ids.tolist(), selected.tolist())
+    packed = packed_storage_enabled()
+    if packed:
+        values['packed_answers'] = packed_answers
+    attempt_id = _insert_attempt(values)
+    if attempt_id is None:
+        db.session.rollback()
+        return QuizResult.query.filter_by(user_id=user_id, quiz_id=key.quiz_id).first(), False
+
+    # Answers and statistics are written only by the request that created the attempt
+    attempt = db.session.get(QuizResult, attempt_id)
+    if not packed:
+        insert_answers(user_id, key, selected)
+    add_results([attempt])
+    db.session.commit()
+    record_result(attempt)
+    return attempt, True
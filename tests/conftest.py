@@ -0,0 +1,90 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db, User, Subject, Chapter, Question, Quiz
+import identity
+import item_analysis
+import leaderboard
+import login_limiter
+import quiz_cache
+import search_index
+
+PASSWORD = 'secret'
+HASH_METHOD = 'pbkdf2:sha256:1'
+
+
+@pytest.fixture
+def app(tmp_path):
+    # caches are per process, so a new database must not see entries of the last one
+    for cache in (quiz_cache._payloads, leaderboard._boards, search_index._backends,
+                  identity._revoked, login_limiter._buckets, item_analysis._reports):
+        cache.clear()
+    identity._revoked_loaded_at = None
+    app = create_app({
+        'TESTING': True,
+        'SECRET_KEY': 'test',
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "test.db"}',
+        'PASSWORD_HASH_METHOD': HASH_METHOD,
+        'PASSWORD_HASH_WORKERS': 0,
+        'REGRADE_RECHECK_DELAY': 0,
+        # the prewarm thread would outlive this database
+        'QUIZ_CACHE_PREWARM_INTERVAL': 0,
+    })
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def add_user(username, is_admin=False):
+    user = User(username=username, password=generate_password_hash(PASSWORD, method=HASH_METHOD),
+                name=username.title(), qualification='-', dob='2000-01-01', is_admin=is_admin)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def add_chapter(subject_name, chapter_name):
+    subject = Subject.query.filter_by(sub_name=subject_name).first()
+    if subject is None:
+        subject = Subject(subjectId=subject_name[:3].upper(), sub_name=subject_name, description='-')
+        db.session.add(subject)
+        db.session.flush()
+    chapter = Chapter(chapterId=chapter_name[:3].upper(), chapter_name=chapter_name, description='-',
+                      subject_id=subject.id)
+    db.session.add(chapter)
+    db.session.commit()
+    return chapter
+
+
+def add_question(chapter, number, correct_option='1', marks=1):
+    question = Question(questionId=f'{chapter.chapterId}-{number}', title=f'Question {number}?',
+                        option1='a', option2='b', option3='c', option4='d',
+                        correct_option=correct_option, marks=marks, chapter_id=chapter.id)
+    db.session.add(question)
+    db.session.commit()
+    return question
+
+
+def add_quiz(chapter, number_of_questions, title='Quiz'):
+    quiz = Quiz(quizId=f'QZ{chapter.id}', title=title, description='-', number_of_questions=number_of_questions,
+                duration=30, due_date=datetime.now() + timedelta(days=1),
+                subject_id=chapter.subject_id, chapter_id=chapter.id)
+    db.session.add(quiz)
+    db.session.commit()
+    return quiz
+
+
+def login(app, username):
+    client = app.test_client()
+    response = client.post('/login', data={'username': username, 'password': PASSWORD})
+    assert response.status_code == 302
+    return client
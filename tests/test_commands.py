@@ -0,0 +1,14 @@
+from models import db, Question
+
+
+def test_import_into_a_missing_chapter_is_refused(app, tmp_path):
+    path = tmp_path / 'questions.csv'
+    path.write_text('questionId,title,option1,option2,option3,option4,correct_option,marks\n'
+                    'Q1,Question?,a,b,c,d,1,1\n')
+
+    result = app.test_cli_runner().invoke(args=['import-questions', '42', str(path)])
+
+    assert result.exit_code == 1
+    assert 'Chapter 42 does not exist.' in result.output
+    with app.app_context():
+        assert db.session.query(Question).count() == 0
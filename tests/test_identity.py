@@ -0,0 +1,25 @@
+import time
+
+import identity
+from identity import invalidate_user
+from models import db, User
+from conftest import add_user, login
+
+
+def test_revocation_reaches_workers_that_did_not_handle_it(app):
+    app.config['ROLE_CLAIM_TRUST'] = True
+    with app.app_context():
+        admin_id = add_user('admin', is_admin=True).id
+    client = login(app, 'admin')
+    assert client.get('/admin/summary').status_code == 200
+
+    with app.app_context():
+        db.session.get(User, admin_id).is_admin = False
+        db.session.commit()
+        invalidate_user(admin_id)
+
+    # another worker: its copy of the revocations was loaded before this one
+    identity._revoked = {}
+    identity._revoked_loaded_at = time.monotonic() - app.config['ROLE_CLAIM_REVOCATION_REFRESH']
+
+    assert client.get('/admin/summary').status_code == 302
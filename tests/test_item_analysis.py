@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from models import db, QuizResult, UserAnswer
+import quiz_cache
+from item_analysis import build_report, get_report
+from conftest import add_user, add_chapter, add_question, add_quiz
+
+
+def _quiz_with_attempts():
+    chapter = add_chapter('Physics', 'Optics')
+    questions = [add_question(chapter, number, correct_option='1') for number in range(6)]
+    quiz = add_quiz(chapter, 3)
+    for index in range(9):
+        user = add_user(f'learner{index}')
+        # each learner gets three questions and answers the first `index % 4` of them right
+        for position, question in enumerate(questions[index % 4:index % 4 + 3]):
+            option = '1' if position < index % 4 else '2'
+            db.session.add(UserAnswer(user_id=user.id, quiz_id=quiz.id, question_id=question.id,
+                                      selected_option=option))
+        db.session.add(QuizResult(score=0, total_marks=3, total_questions=3, user_id=user.id, quiz_id=quiz.id))
+    db.session.commit()
+    return quiz, questions
+
+
+def test_chunks_only_change_how_much_is_read_at_once(app):
+    with app.app_context():
+        quiz, _ = _quiz_with_attempts()
+        whole = build_report(quiz.id, chunk_size=100)
+        assert build_report(quiz.id, chunk_size=2) == whole
+        assert whole['attempts'] == 9
+
+
+def test_report_follows_the_answer_key_version(app):
+    with app.app_context():
+        quiz, questions = _quiz_with_attempts()
+        report = build_report(quiz.id)
+
+        # an answer key rebuilt from unchanged questions keeps the report
+        quiz_cache._payloads.clear()
+        assert get_report(quiz.id) == report
+
+        questions[0].correct_option = '2'
+        db.session.commit()
+        quiz_cache._payloads.clear()
+        assert get_report(quiz.id) is None
+        build_report(quiz.id)
+        assert get_report(quiz.id) is not None
+
+
+def test_reliability_is_kr20_when_every_question_is_asked(app):
+    answers = np.array([[1, 1, 1, 0], [1, 1, 0, 0], [1, 0, 0, 0], [1, 1, 1, 1], [0, 1, 0, 0], [1, 1, 0, 1]])
+    with app.app_context():
+        chapter = add_chapter('Physics', 'Optics')
+        questions = [add_question(chapter, number, correct_option='1') for number in range(answers.shape[1])]
+        quiz = add_quiz(chapter, len(questions))
+        for index, row in enumerate(answers):
+            user = add_user(f'learner{index}')
+            for question, right in zip(questions, row):
+                db.session.add(UserAnswer(user_id=user.id, quiz_id=quiz.id, question_id=question.id,
+                                          selected_option='1' if right else '2'))
+            db.session.add(QuizResult(score=0, total_marks=4, total_questions=4, user_id=user.id, quiz_id=quiz.id))
+        db.session.commit()
+        report = build_report(quiz.id, chunk_size=4)
+
+    items = answers.shape[1]
+    p = answers.mean(axis=0)
+    kr20 = items / (items - 1) * (1 - (p * (1 - p)).sum() / answers.sum(axis=1).var())
+    assert report['reliability'] == pytest.approx(kr20)
@@ -0,0 +1,43 @@
+import numpy as np
+
+import leaderboard
+from grading import get_answer_key
+from leaderboard import get_leaderboard, user_standing
+from submissions import record_attempt
+from conftest import add_user, add_chapter, add_question, add_quiz
+
+
+def test_boards_are_bounded_and_least_recently_used_go_first(app):
+    app.config['LEADERBOARD_CACHE_SIZE'] = 2
+    with app.app_context():
+        get_leaderboard(1)
+        get_leaderboard(2)
+        get_leaderboard(1)
+        get_leaderboard(3)
+    assert list(leaderboard._boards) == [1, 3]
+
+
+def test_expired_boards_are_dropped(app):
+    with app.app_context():
+        get_leaderboard(1)
+        leaderboard._boards[1].loaded_at -= app.config['LEADERBOARD_TTL']
+        get_leaderboard(2)
+    assert list(leaderboard._boards) == [2]
+
+
+def test_result_submitted_through_another_worker_has_a_standing(app):
+    with app.app_context():
+        chapter = add_chapter('Physics', 'Optics')
+        add_question(chapter, 1)
+        quiz_id = add_quiz(chapter, 1).id
+        first, second = add_user('first').id, add_user('second').id
+        record_attempt(first, get_answer_key(quiz_id), np.array([1], dtype=np.int8), 'n1')
+        assert user_standing(quiz_id, first)['rank'] == 1
+        # this worker's board, as it was before another worker recorded the second result
+        board = leaderboard._boards[quiz_id]
+        record_attempt(second, get_answer_key(quiz_id), np.array([1], dtype=np.int8), 'n2')
+        leaderboard._boards[quiz_id] = board
+        board.remove_user(second)
+
+        assert user_standing(quiz_id, second) == {'rank': 1, 'total': 2, 'percentile': 100.0, 'percent': 100.0}
+        assert user_standing(quiz_id, add_user('third').id) is None
@@ -0,0 +1,46 @@
+from app import create_app
+from login_limiter import admit_login
+from models import db
+from conftest import HASH_METHOD, add_user
+
+
+def _proxied_app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SECRET_KEY': 'test',
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "proxied.db"}',
+        'PASSWORD_HASH_METHOD': HASH_METHOD,
+        'PASSWORD_HASH_WORKERS': 0,
+        'PROXY_FIX_X_FOR': 1,
+        'LOGIN_ATTEMPTS_PER_IP': 2,
+    })
+    with app.app_context():
+        db.create_all()
+        add_user('learner')
+    return app
+
+
+def _attempt(client, forwarded_for):
+    # all requests come from the proxy's address; only the forwarded one tells clients apart
+    return client.post('/login', data={'username': 'learner', 'password': 'wrong'},
+                       headers={'X-Forwarded-For': forwarded_for}).status_code
+
+
+def test_clients_behind_a_proxy_get_their_own_bucket(app, tmp_path):
+    proxied = _proxied_app(tmp_path)
+    client = proxied.test_client()
+    assert [_attempt(client, '203.0.113.1') for _ in range(3)] == [302, 302, 429]
+    assert _attempt(client, '203.0.113.2') == 302
+    with proxied.app_context():
+        db.engine.dispose()
+
+
+def test_attempt_refused_by_the_address_limit_keeps_the_user_allowance(app):
+    app.config.update(LOGIN_ATTEMPTS_PER_USER=2, LOGIN_ATTEMPTS_PER_IP=1)
+    with app.app_context():
+        assert admit_login('learner', '203.0.113.1') is None
+        for _ in range(3):
+            assert admit_login('learner', '203.0.113.1')
+        # the refused attempts left the user's second token for another address
+        assert admit_login('learner', '203.0.113.2') is None
+        assert admit_login('learner', '203.0.113.3') is not None
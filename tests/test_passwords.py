@@ -0,0 +1,26 @@
+from concurrent.futures.process import BrokenProcessPool
+
+import passwords
+from passwords import hash_password
+
+
+class _BrokenPool:
+    shut_down = False
+
+    def submit(self, *args):
+        raise BrokenProcessPool('a hashing process died')
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+def test_broken_pool_is_shut_down_before_it_is_replaced(app, monkeypatch):
+    broken = _BrokenPool()
+    with app.app_context():
+        passwords._pool()
+        monkeypatch.setattr(passwords, '_executor', broken)
+        assert hash_password('secret') is None
+        assert broken.shut_down
+        # the next call starts a new pool (hashing in the request thread here)
+        assert passwords._pool()[0] is None
+        assert hash_password('secret') is not None
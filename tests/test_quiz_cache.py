@@ -0,0 +1,55 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from models import db, Question
+import quiz_cache
+from grading import get_answer_key
+from conftest import add_user, add_chapter, add_question, add_quiz, login
+
+
+def test_answer_key_edited_in_another_worker_is_not_used(app):
+    with app.app_context():
+        add_user('admin', is_admin=True)
+        chapter = add_chapter('Physics', 'Optics')
+        question_id = add_question(chapter, 1, correct_option='1').id
+        quiz_id = add_quiz(chapter, 1).id
+        assert get_answer_key(quiz_id).correct.tolist() == [1]
+    # this worker's cache, as it was before the edit handled by another worker
+    other_worker = OrderedDict(quiz_cache._payloads)
+
+    login(app, 'admin').post(f'/admin/edit/question/{question_id}', data={'answer': '3'})
+
+    quiz_cache._payloads = other_worker
+    with app.app_context():
+        assert db.session.get(Question, question_id).correct_option == '3'
+        assert get_answer_key(quiz_id).correct.tolist() == [3]
+
+
+def test_prewarm_runs_beside_requests_and_warms_answer_keys(app, monkeypatch):
+    started = []
+    monkeypatch.setattr(quiz_cache, 'Thread', lambda **kwargs: started.append(kwargs['name']) or _NotStarted())
+    monkeypatch.setattr(quiz_cache, '_prewarm_pid', None)
+    app.config['QUIZ_CACHE_PREWARM_INTERVAL'] = 60
+    with app.app_context():
+        chapter = add_chapter('Physics', 'Optics')
+        add_question(chapter, 1)
+        quiz = add_quiz(chapter, 1)
+        # within QUIZ_CACHE_PREWARM_WINDOW
+        quiz.due_date = datetime.now() + timedelta(minutes=30)
+        db.session.commit()
+        quiz_id = quiz.id
+
+    client = app.test_client()
+    client.get('/')
+    client.get('/')
+    assert started == ['quiz-cache-prewarm']
+    assert not quiz_cache._payloads
+
+    with app.app_context():
+        assert quiz_cache.prewarm() == 1
+    assert set(quiz_cache._payloads) == {('payload', quiz_id), ('answer_key', quiz_id)}
+
+
+class _NotStarted:
+    def start(self):
+        pass
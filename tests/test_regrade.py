@@ -0,0 +1,60 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from models import db, Question, QuizResult
+import leaderboard
+import regrade
+from grading import get_answer_key
+from leaderboard import user_standing
+from quiz_cache import invalidate_chapter
+from regrade import regrade_question
+from submissions import record_attempt
+from conftest import add_user, add_chapter, add_question, add_quiz
+
+
+def _quiz_with_one_question():
+    chapter = add_chapter('Physics', 'Optics')
+    question = add_question(chapter, 1, correct_option='1')
+    quiz = add_quiz(chapter, 1)
+    return quiz.id, question.id
+
+
+def _change_answer(question_id, option):
+    question = db.session.get(Question, question_id)
+    question.correct_option = option
+    db.session.commit()
+    invalidate_chapter(question.chapter_id)
+
+
+def test_regrade_reaches_leaderboards_of_other_workers(app):
+    with app.app_context():
+        quiz_id, question_id = _quiz_with_one_question()
+        user_id = add_user('learner').id
+        record_attempt(user_id, get_answer_key(quiz_id), np.array([2], dtype=np.int8), 'n1')
+        assert user_standing(quiz_id, user_id)['percent'] == 0
+        # the boards of a worker that neither handled the edit nor ran the regrade
+        other_worker = OrderedDict(leaderboard._boards)
+
+        _change_answer(question_id, '2')
+        regrade_question(question_id)
+
+        leaderboard._boards = other_worker
+        assert user_standing(quiz_id, user_id)['percent'] == 100
+
+
+def test_submission_graded_with_the_old_key_is_rechecked(app, monkeypatch):
+    with app.app_context():
+        quiz_id, question_id = _quiz_with_one_question()
+        user_id = add_user('learner').id
+        stale_key = get_answer_key(quiz_id)
+        _change_answer(question_id, '2')
+
+        def late_submission(seconds):
+            # another worker read the key before the edit and commits only after the first pass
+            record_attempt(user_id, stale_key, np.array([1], dtype=np.int8), 'n1')
+        monkeypatch.setattr(regrade.time, 'sleep', late_submission)
+        regrade_question(question_id)
+
+        attempt = QuizResult.query.filter_by(user_id=user_id, quiz_id=quiz_id).one()
+        assert (attempt.score, attempt.total_marks) == (0, 1)
@@ -0,0 +1,58 @@
+from sqlalchemy import text
+
+from models import db, Quiz
+from search_index import get_backend, index_object, search
+from conftest import add_user, add_chapter, add_quiz, login
+
+
+def test_moved_quiz_is_found_by_its_new_subject(app):
+    with app.app_context():
+        add_user('admin', is_admin=True)
+        optics = add_chapter('Physics', 'Optics')
+        cells = add_chapter('Biology', 'Cells')
+        quiz = add_quiz(optics, number_of_questions=1, title='Weekly test')
+        index_object(quiz)
+        db.session.commit()
+        quiz_id, subject_id, chapter_id = quiz.id, cells.subject_id, cells.id
+
+    admin = login(app, 'admin')
+    admin.post(f'/edit/quiz/{quiz_id}', data={
+        'quizId': 'QZ1', 'title': 'Weekly test', 'description': '-', 'subject': subject_id,
+        'chapter': chapter_id, 'num_questions': 1, 'duration': 30, 'due_date': '2099-01-01T10:00',
+    })
+
+    with app.app_context():
+        assert db.session.get(Quiz, quiz_id).subject_id == subject_id
+        assert [quiz.id for quiz in search('quiz_topic', 'Biology')] == [quiz_id]
+        assert [quiz.id for quiz in search('quiz_topic', 'Cells')] == [quiz_id]
+        assert search('quiz_topic', 'Physics') == []
+        assert search('quiz_topic', 'Optics') == []
+
+
+def test_rebuild_on_a_database_that_already_indexed_rows(app):
+    with app.app_context():
+        for index in range(50):
+            index_object(add_user(f'learner{index}'))
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['rebuild-search-index'])
+    assert result.exit_code == 0, result.output
+
+    with app.app_context():
+        assert get_backend().name == 'sqlite_fts5'
+        assert db.session.execute(text("PRAGMA integrity_check")).scalar() == 'ok'
+        db.session.execute(text("INSERT INTO search_document_fts(search_document_fts) VALUES ('integrity-check')"))
+        assert [user.username for user in search('user', 'learner42')] == ['learner42']
+
+
+def test_search_says_when_results_were_cut_off(app):
+    app.config['SEARCH_RESULT_LIMIT'] = 3
+    with app.app_context():
+        add_user('admin', is_admin=True)
+        for index in range(4):
+            index_object(add_user(f'learner{index}'))
+        db.session.commit()
+        assert search('user', 'learner').truncated
+        assert not search('user', 'learner3').truncated
+    admin = login(app, 'admin')
+    assert 'Showing the best 3' in admin.post('/search/result', data={'search': 'learner'}).get_data(as_text=True)
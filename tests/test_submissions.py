@@ -0,0 +1,67 @@
+import re
+
+from models import db, Chapter, Question, QuizResult
+from quiz_cache import invalidate_chapter
+from conftest import add_user, add_chapter, add_question, add_quiz, login
+
+
+def _start(client, quiz_id):
+    page = client.get(f'/quiz/start/{quiz_id}').get_data(as_text=True)
+    shown = [int(question_id) for question_id in dict.fromkeys(re.findall(r'name="question_(\d+)"', page))]
+    token = re.search(r'name="submission_token" value="([^"]+)"', page).group(1)
+    return shown, token
+
+
+def _correct_answers(shown, token):
+    form = {f'question_{question.id}': question.correct_option
+            for question in Question.query.filter(Question.id.in_(shown))}
+    form['submission_token'] = token
+    return form
+
+
+def _setup(app):
+    with app.app_context():
+        add_user('learner')
+        chapter = add_chapter('Physics', 'Optics')
+        for number in range(6):
+            add_question(chapter, number, correct_option=str(number % 4 + 1))
+        return chapter.id, add_quiz(chapter, number_of_questions=3).id
+
+
+def test_submission_is_graded_on_the_questions_shown_after_the_bank_grows(app):
+    chapter_id, quiz_id = _setup(app)
+    client = login(app, 'learner')
+    shown, token = _start(client, quiz_id)
+    assert len(shown) == 3
+
+    with app.app_context():
+        chapter = db.session.get(Chapter, chapter_id)
+        for number in range(6, 9):
+            add_question(chapter, number)
+        invalidate_chapter(chapter_id)
+        form = _correct_answers(shown, token)
+
+    client.post(f'/submit/quiz/{quiz_id}', data=form)
+
+    with app.app_context():
+        attempt = QuizResult.query.filter_by(quiz_id=quiz_id).one()
+        assert [int(question_id) for question_id in attempt.question_ids.split(',')] == shown
+        assert (attempt.score, attempt.total_marks) == (3, 3)
+
+
+def test_submission_is_rejected_when_a_shown_question_was_deleted(app):
+    chapter_id, quiz_id = _setup(app)
+    client = login(app, 'learner')
+    shown, token = _start(client, quiz_id)
+
+    with app.app_context():
+        form = _correct_answers(shown, token)
+        db.session.delete(db.session.get(Question, shown[1]))
+        db.session.commit()
+        invalidate_chapter(chapter_id)
+
+    response = client.post(f'/submit/quiz/{quiz_id}', data=form, follow_redirects=True)
+
+    assert 'removed while you were taking it' in response.get_data(as_text=True)
+    with app.app_context():
+        assert QuizResult.query.filter_by(quiz_id=quiz_id).count() == 0